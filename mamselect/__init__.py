@@ -1,4 +1,4 @@
-from mamselect import masks, mesh, pattern, isolate, subd
+from mamselect import masks, mesh, pattern, isolate, subd, query, geodesic
 from mamselect.coplanar import coplanar
 
 
@@ -0,0 +1,59 @@
+"""
+Process pool driver running :mod:`query` checks over many asset files.
+
+Each worker initializes its own mayapy session, opens one asset at a time and
+validates every mesh in it. Results are yielded as assets finish, not in the
+order they were given.
+
+Usage (from a mayapy script, guarded for platforms that spawn workers):
+
+    if __name__ == '__main__':
+        for path, report in batch.run(paths, checks=('ngons', 'shells')):
+            print path, report
+
+"""
+import logging
+import traceback
+import functools
+import multiprocessing
+
+from mamselect import query, topology
+
+logger = logging.getLogger(__name__)
+
+
+def _initialize():
+    from maya import standalone
+    standalone.initialize(name='python')
+
+
+def validate_file(path, checks=query.DEFAULT_CHECKS):
+    """
+    Return ``(path, report)`` where report maps mesh names to check results.
+
+    Failures are reported under the ``'error'`` key instead of raised, so a
+    single broken asset doesn't stop the pool.
+    """
+    from maya import cmds
+    try:
+        cmds.file(path, open=True, force=True, ignoreVersion=True)
+        meshes = cmds.ls(type='mesh', noIntermediate=True, long=True) or []
+        report = dict((mesh, query.validate(mesh, checks)) for mesh in meshes)
+    except Exception:
+        report = {'error': traceback.format_exc()}
+    finally:
+        # Cached topology belongs to the scene that was just validated.
+        topology.invalidate()
+    return path, report
+
+
+def run(paths, checks=query.DEFAULT_CHECKS, processes=None):
+    """Yield ``(path, report)`` from a pool of mayapy workers as they finish."""
+    worker = functools.partial(validate_file, checks=checks)
+    pool = multiprocessing.Pool(processes, initializer=_initialize)
+    try:
+        for result in pool.imap_unordered(worker, paths):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,156 @@
+"""
+Fixed size bitset for component indices.
+
+Bits live in a bytearray so single index membership is constant time, set
+algebra converts to python longs to let the interpreter work a machine word at a
+time.
+
+Usage:
+
+    selected = Bitset.from_indices([0, 1, 2, 8], size=10)
+    5 in selected
+    list(selected.complement().ranges())  # [(3, 7), (9, 9)]
+
+"""
+import binascii
+
+
+# Bit positions set in each possible byte value.
+BIT_TABLE = tuple(
+    tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)
+)
+
+
+class Bitset(object):
+
+    __slots__ = ('data', 'size')
+
+    def __init__(self, size=0, data=None):
+        self.size = size
+        self.data = bytearray((size + 7) // 8) if data is None else data
+
+    def __repr__(self):
+        return '{}(size={}, count={})'.format(
+            self.__class__.__name__, self.size, len(self))
+
+    def __contains__(self, index):
+        return 0 <= index < self.size and bool(self.data[index >> 3] >> (index & 7) & 1)
+
+    def __len__(self):
+        return bin(self.to_int()).count('1')
+
+    def __nonzero__(self):
+        return any(self.data)
+    __bool__ = __nonzero__
+
+    def __iter__(self):
+        for pos, byte in enumerate(self.data):
+            if byte:
+                base = pos << 3
+                for bit in BIT_TABLE[byte]:
+                    yield base + bit
+
+    def __eq__(self, other):
+        return self.size == other.size and self.data == other.data
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __or__(self, other):
+        return self.from_int(self.to_int() | other.to_int(), max(self.size, other.size))
+
+    def __and__(self, other):
+        return self.from_int(self.to_int() & other.to_int(), max(self.size, other.size))
+
+    def __sub__(self, other):
+        return self.from_int(self.to_int() & ~other.to_int(), max(self.size, other.size))
+
+    def __xor__(self, other):
+        return self.from_int(self.to_int() ^ other.to_int(), max(self.size, other.size))
+
+    @classmethod
+    def from_indices(cls, indices, size):
+        bitset = cls(size)
+        bitset.update(indices)
+        return bitset
+
+    @classmethod
+    def from_int(cls, value, size):
+        data = bytearray((size + 7) // 8)
+        if value:
+            hexed = '%x' % value
+            raw = bytearray(binascii.unhexlify(('0' * (len(hexed) % 2)) + hexed))
+            raw.reverse()
+            data[:len(raw)] = raw[:len(data)]
+        return cls(size, data)
+
+    @classmethod
+    def full(cls, size):
+        return cls.from_int((1 << size) - 1, size)
+
+    def to_int(self):
+        if not self.data:
+            return 0
+        return int(binascii.hexlify(bytes(self.data[::-1])), 16)
+
+    def copy(self):
+        return self.__class__(self.size, bytearray(self.data))
+
+    def add(self, index):
+        self.data[index >> 3] |= 1 << (index & 7)
+
+    def discard(self, index):
+        self.data[index >> 3] &= ~(1 << (index & 7)) & 0xff
+
+    def update(self, indices):
+        data = self.data
+        for index in indices:
+            data[index >> 3] |= 1 << (index & 7)
+
+    def add_range(self, start, end):
+        """Set all bits from start to end inclusive."""
+        stop = end + 1
+        first, last = (start + 7) >> 3, stop >> 3
+        if first >= last:
+            self.update(xrange(start, stop))
+            return
+        self.update(xrange(start, first << 3))
+        self.data[first:last] = b'\xff' * (last - first)
+        self.update(xrange(last << 3, stop))
+
+    def difference_update(self, indices):
+        data = self.data
+        for index in indices:
+            data[index >> 3] &= ~(1 << (index & 7)) & 0xff
+
+    def complement(self):
+        return self.from_int(~self.to_int() & ((1 << self.size) - 1), self.size)
+
+    def is_complete(self):
+        return self.to_int() == (1 << self.size) - 1
+
+    def ranges(self):
+        """Yield inclusive ``(start, end)`` runs of set bits."""
+        start = end = None
+        for pos, byte in enumerate(self.data):
+            if not byte:
+                continue
+            base = pos << 3
+            if byte == 0xff:
+                if end == base:
+                    end = base + 8
+                else:
+                    if start is not None:
+                        yield start, end - 1
+                    start, end = base, base + 8
+                continue
+            for bit in BIT_TABLE[byte]:
+                index = base + bit
+                if end == index:
+                    end = index + 1
+                else:
+                    if start is not None:
+                        yield start, end - 1
+                    start, end = index, index + 1
+        if start is not None:
+            yield start, end - 1
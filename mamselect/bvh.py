@@ -0,0 +1,390 @@
+"""
+Bounding volume hierarchies for picking meshes under the cursor.
+
+The scene tree holds the world space bounding box of every mesh and is refit,
+not rebuilt, when a transform or mesh changes. Meshes whose box is hit by the
+cursor ray get their own triangle tree in object space, so the first hit is
+found by descending two trees in order of distance instead of testing every
+object in the scene.
+
+Usage:
+
+    picker = get_picker()
+    hit = picker.pick(*cursor_ray())
+    if hit:
+        dagpath, face, distance = hit
+
+"""
+import heapq
+import array
+import logging
+
+from PySide import QtGui
+
+from maya import cmds
+import maya.api.OpenMaya as api
+import maya.api.OpenMayaUI as omui
+
+from mampy._old.utils import mvp
+
+from mamselect.topology import get_dagpath
+
+logger = logging.getLogger(__name__)
+
+
+# Items kept in a leaf before it is split.
+LEAF_SIZE = 4
+# Mesh attributes, by name prefix, whose dirtying changes object space triangles.
+# The world space ``worldMesh`` is left out, it dirties on every move.
+GEOMETRY_ATTRIBUTES = ('inMesh', 'outMesh', 'pnts', 'vrts')
+EPSILON = 1e-9
+INFINITY = float('inf')
+
+
+def union(boxes):
+    """Return box enclosing all given ``(min x, y, z, max x, y, z)`` boxes."""
+    boxes = iter(boxes)
+    result = list(next(boxes))
+    for box in boxes:
+        for axis in xrange(3):
+            result[axis] = min(result[axis], box[axis])
+            result[axis + 3] = max(result[axis + 3], box[axis + 3])
+    return tuple(result)
+
+
+def intersect_box(box, origin, inverse):
+    """Return distance along ray to where it enters box, or None."""
+    near, far = -INFINITY, INFINITY
+    for axis in xrange(3):
+        t1 = (box[axis] - origin[axis]) * inverse[axis]
+        t2 = (box[axis + 3] - origin[axis]) * inverse[axis]
+        if t1 > t2:
+            t1, t2 = t2, t1
+        near, far = max(near, t1), min(far, t2)
+        if near > far:
+            return None
+    if far < 0:
+        return None
+    return max(near, 0.0)
+
+
+def intersect_triangle(origin, direction, p0, p1, p2):
+    """Return distance along ray to triangle (Moller-Trumbore), or None."""
+    e1 = (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2])
+    e2 = (p2[0] - p0[0], p2[1] - p0[1], p2[2] - p0[2])
+    px = direction[1] * e2[2] - direction[2] * e2[1]
+    py = direction[2] * e2[0] - direction[0] * e2[2]
+    pz = direction[0] * e2[1] - direction[1] * e2[0]
+    det = e1[0] * px + e1[1] * py + e1[2] * pz
+    if abs(det) < EPSILON:
+        return None
+
+    inv = 1.0 / det
+    tx, ty, tz = origin[0] - p0[0], origin[1] - p0[1], origin[2] - p0[2]
+    u = (tx * px + ty * py + tz * pz) * inv
+    if u < 0.0 or u > 1.0:
+        return None
+    qx = ty * e1[2] - tz * e1[1]
+    qy = tz * e1[0] - tx * e1[2]
+    qz = tx * e1[1] - ty * e1[0]
+    v = (direction[0] * qx + direction[1] * qy + direction[2] * qz) * inv
+    if v < 0.0 or u + v > 1.0:
+        return None
+    t = (e2[0] * qx + e2[1] * qy + e2[2] * qz) * inv
+    return t if t > EPSILON else None
+
+
+class AABBTree(object):
+    """
+    Bounding volume hierarchy over axis aligned boxes.
+
+    Nodes live in flat arrays; leaves point at a run of ``order`` holding up to
+    ``LEAF_SIZE`` item indices. Boxes of single items can be updated with
+    :meth:`refit` without rebuilding the tree.
+    """
+
+    def __init__(self, boxes):
+        self.boxes = list(boxes)
+        self.bounds = []
+        self.left = array.array('i')
+        self.right = array.array('i')
+        self.parent = array.array('i')
+        self.start = array.array('i')
+        self.count = array.array('i')
+        self.order = array.array('i', xrange(len(self.boxes)))
+        self.leaf_of = array.array('i', [-1]) * len(self.boxes)
+        if self.boxes:
+            self._build()
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _add_node(self, parent, start, count):
+        self.bounds.append(union(self.boxes[i] for i in self.order[start:start + count]))
+        self.left.append(-1)
+        self.right.append(-1)
+        self.parent.append(parent)
+        self.start.append(start)
+        self.count.append(count)
+        return len(self.bounds) - 1
+
+    def _build(self):
+        stack = [self._add_node(-1, 0, len(self.boxes))]
+        while stack:
+            node = stack.pop()
+            start, count = self.start[node], self.count[node]
+            if count <= LEAF_SIZE:
+                for i in self.order[start:start + count]:
+                    self.leaf_of[i] = node
+                continue
+
+            # Split at the median centroid along the longest axis.
+            box = self.bounds[node]
+            axis = max(xrange(3), key=lambda a: box[a + 3] - box[a])
+            items = sorted(
+                self.order[start:start + count],
+                key=lambda i: self.boxes[i][axis] + self.boxes[i][axis + 3]
+            )
+            self.order[start:start + count] = array.array('i', items)
+
+            half = count // 2
+            self.left[node] = self._add_node(node, start, half)
+            self.right[node] = self._add_node(node, start + half, count - half)
+            self.count[node] = 0
+            stack.extend((self.left[node], self.right[node]))
+
+    def refit(self, item, box):
+        """Update box of item and the bounds of every node above it."""
+        self.boxes[item] = box
+        node = self.leaf_of[item]
+        start, count = self.start[node], self.count[node]
+        self.bounds[node] = union(self.boxes[i] for i in self.order[start:start + count])
+        node = self.parent[node]
+        while not node == -1:
+            self.bounds[node] = union(
+                (self.bounds[self.left[node]], self.bounds[self.right[node]])
+            )
+            node = self.parent[node]
+
+    def ray_cast(self, origin, direction, hit_item):
+        """
+        Return ``(distance, item, data)`` of closest hit, or None.
+
+        ``hit_item(item)`` returns ``(distance, data)`` or None. Nodes are
+        visited closest first and skipped once they lie behind the best hit.
+        """
+        if not self.bounds:
+            return None
+        inverse = tuple(1.0 / d if abs(d) > EPSILON else INFINITY for d in direction)
+        entry = intersect_box(self.bounds[0], origin, inverse)
+        if entry is None:
+            return None
+
+        best = None
+        heap = [(entry, 0)]
+        while heap:
+            entry, node = heapq.heappop(heap)
+            if best is not None and entry >= best[0]:
+                break
+            if self.left[node] == -1:
+                start, count = self.start[node], self.count[node]
+                for item in self.order[start:start + count]:
+                    hit = hit_item(item)
+                    if hit is not None and (best is None or hit[0] < best[0]):
+                        best = (hit[0], item, hit[1])
+                continue
+            for child in (self.left[node], self.right[node]):
+                child_entry = intersect_box(self.bounds[child], origin, inverse)
+                if child_entry is not None:
+                    heapq.heappush(heap, (child_entry, child))
+        return best
+
+
+class MeshTriangles(object):
+    """Triangle tree of a mesh in object space."""
+
+    def __init__(self, dagpath):
+        mesh = api.MFnMesh(dagpath)
+        self.points = [(p.x, p.y, p.z) for p in mesh.getPoints(api.MSpace.kObject)]
+
+        counts, vertices = mesh.getTriangles()
+        self.triangles = array.array('i', vertices)
+        self.faces = array.array('i')
+        for face, count in enumerate(counts):
+            self.faces.extend([face] * count)
+
+        boxes = []
+        for tri in xrange(len(self.faces)):
+            p0, p1, p2 = self._get_points(tri)
+            boxes.append(tuple(
+                [min(p0[a], p1[a], p2[a]) for a in xrange(3)] +
+                [max(p0[a], p1[a], p2[a]) for a in xrange(3)]
+            ))
+        self.tree = AABBTree(boxes)
+
+    def _get_points(self, triangle):
+        i = triangle * 3
+        return [self.points[v] for v in self.triangles[i:i + 3]]
+
+    def ray_cast(self, origin, direction):
+        """Return ``(distance, face)`` of closest hit in object space, or None."""
+        def hit_triangle(triangle):
+            t = intersect_triangle(origin, direction, *self._get_points(triangle))
+            return None if t is None else (t, self.faces[triangle])
+
+        hit = self.tree.ray_cast(origin, direction, hit_triangle)
+        return None if hit is None else (hit[0], hit[2])
+
+
+class ScenePicker(object):
+    """
+    Scene wide mesh picking.
+
+    Transform and mesh changes mark single meshes dirty, which are refit into
+    the tree on the next pick. Only geometry changes drop the object space
+    triangle tree of a mesh. Adding or removing meshes rebuilds the tree.
+    """
+
+    def __init__(self):
+        self.stale = True
+        self.meshes = []
+        self.tree = None
+        self.triangles = {}
+        self.dirty = set()
+        self._callbacks = []
+        self._mesh_callbacks = []
+
+        self._callbacks.append(api.MDGMessage.addNodeAddedCallback(self._on_stale, 'mesh'))
+        self._callbacks.append(api.MDGMessage.addNodeRemovedCallback(self._on_stale, 'mesh'))
+
+    def _on_stale(self, *args):
+        self.stale = True
+
+    def _on_moved(self, *args):
+        self.dirty.add(args[-1])
+
+    def _on_plug_dirty(self, node, plug, item):
+        if api.MFnAttribute(plug.attribute()).name.startswith(GEOMETRY_ATTRIBUTES):
+            self.dirty.add(item)
+            self.triangles.pop(item, None)
+
+    def remove_callbacks(self, mesh_only=False):
+        callbacks = self._mesh_callbacks
+        if not mesh_only:
+            callbacks = callbacks + self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            try:
+                api.MMessage.removeCallback(callback)
+            except RuntimeError:
+                pass
+        self._mesh_callbacks = []
+
+    def get_world_box(self, dagpath):
+        box = api.MFnDagNode(dagpath).boundingBox
+        box.transformUsing(dagpath.inclusiveMatrix())
+        lo, hi = box.min, box.max
+        return (lo.x, lo.y, lo.z, hi.x, hi.y, hi.z)
+
+    def build(self):
+        self.remove_callbacks(mesh_only=True)
+        names = cmds.ls(type='mesh', noIntermediate=True, long=True) or []
+        self.meshes = [get_dagpath(name) for name in names]
+        self.tree = AABBTree(self.get_world_box(d) for d in self.meshes)
+        self.triangles.clear()
+        self.dirty.clear()
+
+        for item, dagpath in enumerate(self.meshes):
+            self._mesh_callbacks.append(api.MDagMessage.addWorldMatrixModifiedCallback(
+                dagpath, self._on_moved, item))
+            self._mesh_callbacks.append(api.MNodeMessage.addNodeDirtyPlugCallback(
+                dagpath.node(), self._on_plug_dirty, item))
+        self.stale = False
+        logger.debug('Built scene tree for {} meshes.'.format(len(self.meshes)))
+
+    def update(self):
+        if self.stale or self.tree is None:
+            return self.build()
+        for item in self.dirty:
+            self.tree.refit(item, self.get_world_box(self.meshes[item]))
+        self.dirty.clear()
+
+    def hit_mesh(self, item, origin, direction):
+        """Return ``(distance, face)`` of world space ray on mesh item, or None."""
+        dagpath = self.meshes[item]
+        if not dagpath.isVisible():
+            return None
+        if item not in self.triangles:
+            self.triangles[item] = MeshTriangles(dagpath)
+
+        inverse = dagpath.inclusiveMatrixInverse()
+        local_origin, local_direction = origin * inverse, direction * inverse
+        hit = self.triangles[item].ray_cast(
+            (local_origin.x, local_origin.y, local_origin.z),
+            (local_direction.x, local_direction.y, local_direction.z),
+        )
+        if hit is None:
+            return None
+        local = local_origin + local_direction * hit[0]
+        return origin.distanceTo(local * dagpath.inclusiveMatrix()), hit[1]
+
+    def pick(self, origin, direction):
+        """Return ``(dagpath, face, distance)`` of closest visible hit, or None."""
+        origin, direction = api.MPoint(origin), api.MVector(direction).normal()
+        try:
+            hit = self._pick(origin, direction)
+        except RuntimeError:
+            # A mesh was deleted before callbacks caught up. Rebuild and retry
+            # once, skipping meshes that still fail.
+            self.stale = True
+            hit = self._pick(origin, direction, skip_errors=True)
+        if hit is None:
+            return None
+        distance, item, face = hit
+        return self.meshes[item], face, distance
+
+    def _pick(self, origin, direction, skip_errors=False):
+        self.update()
+
+        def hit_mesh(item):
+            try:
+                return self.hit_mesh(item, origin, direction)
+            except RuntimeError:
+                if not skip_errors:
+                    raise
+                logger.debug('Skipped mesh {} failing to pick.'.format(item))
+                return None
+
+        return self.tree.ray_cast(
+            (origin.x, origin.y, origin.z),
+            (direction.x, direction.y, direction.z),
+            hit_mesh,
+        )
+
+
+PICKER = None
+
+
+def get_picker():
+    global PICKER
+    if PICKER is None:
+        PICKER = ScenePicker()
+    return PICKER
+
+
+def cursor_ray():
+    """Return world space origin and direction of ray under the cursor."""
+    widget = mvp.Viewport.active().widget
+    pos = widget.mapFromGlobal(QtGui.QCursor.pos())
+    view = omui.M3dView.active3dView()
+    return view.viewToWorld(pos.x(), view.portHeight() - pos.y())
+
+
+def get_object_under_cursor():
+    """Return full path of transform of mesh under cursor, or None."""
+    hit = get_picker().pick(*cursor_ray())
+    if hit is None:
+        return None
+    transform = api.MDagPath(hit[0])
+    transform.pop()
+    return transform.fullPathName()
@@ -0,0 +1,118 @@
+"""
+Compact component containers for the mamselect hot paths.
+
+mampy components and python sets hold one python object per index. These keep
+indices in int32 arrays next to the dagpath and component type, and are only
+converted to mampy types where a caller needs them.
+
+Usage:
+
+    comps = ComponentArrayList()
+    comps.append(ComponentArray(dagpath, MFn.kMeshPolygonComponent, [0, 1]))
+    selection.replace(comps.regions())
+
+"""
+import array
+import collections
+
+import maya.api.OpenMaya as api
+
+from mampy.core.selectionlist import ComponentList
+from mampy.core.components import SingleIndexComponent
+
+from mamselect.bitset import Bitset
+from mamselect.selection import get_component_count
+from mamselect.topology import get_dagpath
+
+
+class ComponentArray(object):
+    """Indices of one mesh and component type stored as an int32 array."""
+
+    __slots__ = ('dagpath', 'type', 'indices')
+
+    def __init__(self, dagpath, comptype, indices=()):
+        self.dagpath = get_dagpath(dagpath)
+        self.type = comptype
+        self.indices = array.array('i', indices)
+
+    def __repr__(self):
+        return '{}({}, {}, {} indices)'.format(
+            self.__class__.__name__, self.dagpath.fullPathName(), self.type, len(self))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return iter(self.indices)
+
+    def __nonzero__(self):
+        return bool(self.indices)
+    __bool__ = __nonzero__
+
+    @property
+    def key(self):
+        return self.dagpath.fullPathName(), self.type
+
+    @property
+    def mesh(self):
+        return api.MFnMesh(self.dagpath)
+
+    @classmethod
+    def from_mampy(cls, comp):
+        return cls(comp.dagpath, comp.type, comp.indices)
+
+    def new(self):
+        return self.__class__(self.dagpath, self.type)
+
+    def add(self, indices):
+        self.indices.extend(indices)
+        return self
+
+    def to_bitset(self):
+        count = get_component_count(self.dagpath, self.type)
+        return Bitset.from_indices(self.indices, count)
+
+    def to_mampy(self):
+        return SingleIndexComponent.create(self.dagpath, self.type).add(list(self.indices))
+
+
+class ComponentArrayList(object):
+    """Ordered :class:`ComponentArray` per mesh and component type."""
+
+    __slots__ = ('_items',)
+
+    def __init__(self, comps=()):
+        self._items = collections.OrderedDict()
+        for comp in comps:
+            self.append(comp)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return self._items.itervalues()
+
+    def __nonzero__(self):
+        return any(self._items.itervalues())
+    __bool__ = __nonzero__
+
+    def append(self, comp):
+        """Add comp, merging indices into an existing entry of the same key."""
+        if not isinstance(comp, ComponentArray):
+            comp = ComponentArray.from_mampy(comp)
+        key = comp.key
+        if key in self._items:
+            self._items[key].add(comp.indices)
+        else:
+            self._items[key] = comp
+
+    def regions(self):
+        """Return ``(dagpath, comptype, Bitset)`` regions for selection commits."""
+        return [(c.dagpath, c.type, c.to_bitset()) for c in self if c]
+
+    def to_mampy(self):
+        complist = ComponentList()
+        for comp in self:
+            if comp:
+                complist.append(comp.to_mampy())
+        return complist
@@ -5,6 +5,10 @@
 
 #TODO: Mampy needs updated.
 """
+import math
+import heapq
+import array
+import bisect
 import collections
 
 from PySide import QtCore, QtGui
@@ -14,26 +18,127 @@ import maya.api.OpenMaya as api
 
 import mampy
 from mampy._old.utils import DraggerCtx, mvp
-from mampy._old.containers import SelectionList
+
+from mamselect import selection, symmetry, topology
+from mamselect.components import ComponentArray, ComponentArrayList
 
 
 optionvar = mampy.optionVar()
 
+# Normal tolerance of the planar patches faces are grouped by.
+PATCH_TOLERANCE = 0.001
+
+
+class NormalGroups(object):
+    """Faces of a mesh grouped by planar patch, one world normal per group."""
+
+    __slots__ = ('faces', 'groups', 'normals')
+
+    def __init__(self, dagpath, faces):
+        self.faces = ComponentArray(dagpath, api.MFn.kMeshPolygonComponent, faces)
+        self.groups = array.array('i')
+        self.normals = array.array('d')
+
+        topo = topology.get_topology(self.faces.dagpath)
+        patches = topo.planar_patches(PATCH_TOLERANCE)
+        matrix = self.faces.dagpath.inclusiveMatrixInverse().transpose()
+        lookup = {}
+        for idx in self.faces:
+            patch = patches.labels[idx]
+            if patch not in lookup:
+                lookup[patch] = len(lookup)
+                n = api.MVector(*patches.normals[patch * 3:patch * 3 + 3]) * matrix
+                n.normalize()
+                self.normals.extend((n.x, n.y, n.z))
+            self.groups.append(lookup[patch])
+
+    def matching(self, normal, tolerance):
+        """Return faces whose normal is equivalent to normal."""
+        normals = self.normals
+        equivalent = [
+            normal.isEquivalent(api.MVector(*normals[i:i + 3]), tolerance)
+            for i in xrange(0, len(normals), 3)
+        ]
+        groups = self.groups
+        return [f for i, f in enumerate(self.faces) if equivalent[groups[i]]]
+
+
+class PatchField(object):
+    """
+    Planar patches connected to the patches of seed faces.
+
+    Seed faces are looked up in the mesh's cached :class:`PatchIndex` and
+    reached at zero. Other patches are reached at the largest deviation from
+    normal along their best path of vertex connected patches, so the
+    contiguous selection for a threshold is a bisect into the field. Patches
+    are only visited once a threshold asks for them, a click never walks
+    further than the patches it selects and their neighbours.
+    """
+
+    __slots__ = ('faces', 'patches', 'normal', 'matrix', 'order', 'thresholds',
+                 'reached', 'heap', 'deviations')
+
+    def __init__(self, dagpath, seeds, normal):
+        self.faces = ComponentArray(dagpath, api.MFn.kMeshPolygonComponent)
+        topo = topology.get_topology(self.faces.dagpath)
+        self.patches = topo.planar_patches(PATCH_TOLERANCE)
+        self.normal = normal
+        self.matrix = self.faces.dagpath.inclusiveMatrixInverse().transpose()
+        self.order = array.array('i')
+        self.thresholds = array.array('d')
+        self.reached = set()
+        self.deviations = {}
+        self.heap = [(0.0, patch) for patch in self.patches.patch_ids(seeds)]
+
+    def _deviation(self, patch):
+        if patch not in self.deviations:
+            normals = self.patches.normals
+            n = api.MVector(*normals[patch * 3:patch * 3 + 3]) * self.matrix
+            n.normalize()
+            self.deviations[patch] = math.sqrt(
+                (n.x - self.normal.x) ** 2 + (n.y - self.normal.y) ** 2 +
+                (n.z - self.normal.z) ** 2)
+        return self.deviations[patch]
+
+    def _grow(self, threshold):
+        heap, reached, links = self.heap, self.reached, self.patches.links
+        while heap and heap[0][0] <= threshold:
+            reach, patch = heapq.heappop(heap)
+            if patch in reached:
+                continue
+            reached.add(patch)
+            self.order.append(patch)
+            self.thresholds.append(reach)
+            for other in links[patch]:
+                if other not in reached:
+                    heapq.heappush(heap, (max(reach, self._deviation(other)), other))
+
+    def within(self, threshold):
+        """Return faces of the patches reached at or below threshold."""
+        self._grow(threshold)
+        count = bisect.bisect_right(self.thresholds, threshold)
+        return self.patches.faces(self.order[:count])
+
 
 class coplanar(DraggerCtx):
     """
     Class for selecting coplanar faces.
+
+    With mirror, contiguous and object results are mirrored across
+    :data:`symmetry.AXIS`. Hilited mode is resolved by Maya's selection
+    constraint and is never mirrored.
     """
 
     CONTIGUOUS, OBJECT, HILITED = range(3)
     CONTEXT_NAME = 'mamtools_coplanar_context'
     OPTIONVAR_NAME = 'mamtools_coplanar_threshold'
 
-    def __init__(self, mode, context=False, add=False):
+    def __init__(self, mode, context=False, add=False, mirror=False):
         super(coplanar, self).__init__(self.CONTEXT_NAME)
 
         self.add = add
         self.mode = mode
+        self.mirror = mirror
         self.default = self.threshold
         self.value = self.threshold
 
@@ -42,7 +147,7 @@ class coplanar(DraggerCtx):
         self._normal = None
         self._label = None
         self._mesh_vectors = None
-        self._comp_indices = None
+        self._patch_fields = None
 
         if add:
             self.old_selection = mampy.selected()
@@ -60,16 +165,14 @@ class coplanar(DraggerCtx):
     @property
     def mesh_vectors(self):
         if self._mesh_vectors is None:
-            self._mesh_vectors = collections.defaultdict(
-                 lambda: collections.defaultdict(list)
-         )
+            self._mesh_vectors = collections.OrderedDict()
         return self._mesh_vectors
 
     @property
-    def comp_indices(self):
-        if self._comp_indices is None:
-            self._comp_indices = collections.defaultdict(set)
-        return self._comp_indices
+    def patch_fields(self):
+        if self._patch_fields is None:
+            self._patch_fields = []
+        return self._patch_fields
 
     @property
     def slist(self):
@@ -117,16 +220,16 @@ class coplanar(DraggerCtx):
         return self._label
 
     @classmethod
-    def contiguous(cls, context=False, add=False):
-        return cls(cls.CONTIGUOUS, context, add)
+    def contiguous(cls, context=False, add=False, mirror=False):
+        return cls(cls.CONTIGUOUS, context, add, mirror)
 
     @classmethod
     def hilited(cls, context=False, add=True):
         return cls(cls.HILITED, context, add)
 
     @classmethod
-    def object(cls, context=False, add=True):
-        return cls(cls.OBJECT, context, add)
+    def object(cls, context=False, add=True, mirror=False):
+        return cls(cls.OBJECT, context, add, mirror)
 
     def _setup_hilited(self):
         cmds.polySelectConstraint(
@@ -138,48 +241,28 @@ class coplanar(DraggerCtx):
         )
 
     def _setup_contiguous_object(self):
-        result = SelectionList()
+        result = ComponentArrayList()
         for comp in self.slist.itercomps():
-            get_normal = comp.mesh.getPolygonNormal
+            seed = ComponentArray.from_mampy(comp)
+            result.append(seed.new().add(seed.indices))
 
             if self.mode == self.OBJECT:
-                for idx in comp.get_mesh_shell().indices:
-                    # Create dict object with Vector as key
-                    n = get_normal(idx, api.MSpace.kWorld)
-                    self.mesh_vectors[comp][tuple(n)].append(idx)
-
-                    if self.normal.isEquivalent(n, self.threshold):
-                        comp.add(idx)
-            else:
-                matching = self._get_contiguous(comp)
-                self.comp_indices[comp].update(matching)
-                comp.add(matching)
-
-            result.append(comp)
-        cmds.select(list(result))
-
-    def _get_contiguous(self, comp):
-        get_normal = comp.mesh.getPolygonNormal
-        matching = set()
-        while True:
-            found_matching = False
-
-            comp = comp.to_vert().to_face()
-            for idx in comp.indices:
-                if idx in matching:
-                    continue
-
-                n = get_normal(idx, api.MSpace.kWorld)
-                if n.isEquivalent(self.normal, self.value * 2):
-                    matching.add(idx)
-                    found_matching = True
-
-            if found_matching:
-                comp = comp.new()
-                comp.add(matching)
+                groups = NormalGroups(seed.dagpath, comp.get_mesh_shell().indices)
+                self.mesh_vectors[seed.key] = groups
+                result.append(seed.new().add(groups.matching(self.normal, self.threshold)))
             else:
-                break
-        return matching
+                # Clicks resolve picked faces to their cached patch ids, click
+                # and drag both read the same field over those patches.
+                field = PatchField(seed.dagpath, seed.indices, self.normal)
+                self.patch_fields.append(field)
+                result.append(field.faces.new().add(field.within(self.value * 2)))
+        self._replace(result)
+
+    def _replace(self, result):
+        regions = result.regions()
+        if self.mirror:
+            regions = symmetry.mirrored(regions)
+        selection.replace(regions)
 
     def setup(self):
         self.min, self.max = 0, 1
@@ -219,22 +302,17 @@ class coplanar(DraggerCtx):
             self._update_contiguous()
 
     def _update_contiguous(self):
-        result = SelectionList()
-        for comp in self.comp_indices:
-            new = comp.new()
-            new.add(self._get_contiguous(comp))
-            result.append(new)
-        cmds.select(list(result))
+        result = ComponentArrayList()
+        for field in self.patch_fields:
+            result.append(field.faces.new().add(field.within(self.value * 2)))
+        self._replace(result)
 
     def _update_object(self):
-        result = SelectionList()
-        for comp, normal_indices in self.mesh_vectors.iteritems():
-            new = comp.new()
-            for n in normal_indices:
-                if self.normal.isEquivalent(api.MVector(n), self.value * 2.01):
-                    new.add(normal_indices[n])
-            result.append(new)
-        cmds.select(list(result))
+        result = ComponentArrayList()
+        for groups in self.mesh_vectors.itervalues():
+            faces = groups.matching(self.normal, self.value * 2.01)
+            result.append(groups.faces.new().add(faces))
+        self._replace(result)
 
     def release(self):
         self.default = self.value
@@ -0,0 +1,184 @@
+"""
+Persistent cache of mesh derived arrays stored as memory mapped files.
+
+Each entry is a directory named after a topology hash holding one raw int32
+file per array. Arrays are mapped on first access and read straight from the
+page cache, so opening a scene with heavy assets doesn't rebuild adjacency that
+was already computed in an earlier session. The cache directory is capped at
+``MAX_SIZE`` bytes, least recently used entries are evicted first.
+
+The cache location can be set with the ``MAMSELECT_CACHE_DIR`` environment
+variable and disabled with ``MAMSELECT_DISK_CACHE=0``.
+"""
+import os
+import mmap
+import array
+import shutil
+import struct
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+ENABLED = not os.environ.get('MAMSELECT_DISK_CACHE', '1') == '0'
+CACHE_DIR = os.environ.get(
+    'MAMSELECT_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.mamselect', 'cache')
+)
+MAX_SIZE = 2 * 1024 ** 3
+
+# Meshes below this face count are cheap to build and not worth persisting.
+MIN_FACES = 10000
+
+ITEMSIZE = 4
+
+
+def _from_bytes(data):
+    result = array.array('i')
+    (getattr(result, 'frombytes', None) or result.fromstring)(data)
+    return result
+
+
+def topology_hash(*arrays):
+    """Return hex digest identifying the given connectivity arrays."""
+    hasher = hashlib.sha1()
+    for arr in arrays:
+        hasher.update(struct.pack('q', len(arr)))
+        hasher.update(arr)
+    return hasher.hexdigest()
+
+
+class MappedArray(object):
+    """Read only int32 array backed by a memory mapped file."""
+
+    __slots__ = ('_map', '_length')
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._map = None
+            if size:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._length = size // ITEMSIZE
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if stop <= start:
+                return array.array('i')
+            result = _from_bytes(self._map[start * ITEMSIZE:stop * ITEMSIZE])
+            return result if step == 1 else result[::step]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('MappedArray index out of range.')
+        return struct.unpack_from('i', self._map, index * ITEMSIZE)[0]
+
+    def __iter__(self):
+        chunk = 65536
+        for start in xrange(0, self._length, chunk):
+            for value in self[start:start + chunk]:
+                yield value
+
+
+class Entry(object):
+    """Cached arrays for a single topology hash."""
+
+    def __init__(self, key):
+        self.key = key
+        self.path = os.path.join(CACHE_DIR, key)
+        self._mapped = {}
+
+    def __contains__(self, name):
+        return name in self._mapped or os.path.isfile(self._file(name))
+
+    def __getitem__(self, name):
+        if name not in self._mapped:
+            if name not in self:
+                raise KeyError(name)
+            self._mapped[name] = MappedArray(self._file(name))
+        return self._mapped[name]
+
+    def _file(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def touch(self):
+        try:
+            os.utime(self.path, None)
+        except OSError:
+            pass
+
+    def store(self, name, values):
+        """Write array to entry, replacing the file atomically."""
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        fd, tmp = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            if not isinstance(values, array.array):
+                values = array.array('i', values)
+            values.tofile(f)
+        try:
+            os.rename(tmp, self._file(name))
+        except OSError:
+            # Windows refuses to replace an existing file.
+            os.remove(tmp)
+
+
+def get_entry(key, create=False):
+    """
+    Return :class:`Entry` for key, None if disabled or missing.
+
+    The cache is trimmed once whenever a new entry is opened, rather than
+    after every array written to it.
+    """
+    if not ENABLED:
+        return None
+    entry = Entry(key)
+    if os.path.isdir(entry.path):
+        entry.touch()
+    elif not create:
+        return None
+    else:
+        evict()
+    return entry
+
+
+def get_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+def evict(max_size=None):
+    """Remove least recently used entries until cache fits in max_size."""
+    max_size = MAX_SIZE if max_size is None else max_size
+    try:
+        entries = [os.path.join(CACHE_DIR, n) for n in os.listdir(CACHE_DIR)]
+    except OSError:
+        return
+
+    entries = sorted(
+        ((os.path.getmtime(path), get_size(path), path)
+         for path in entries if os.path.isdir(path)),
+        reverse=True,
+    )
+    total = sum(size for _, size, _ in entries)
+    while entries and total > max_size:
+        _, size, path = entries.pop()
+        try:
+            shutil.rmtree(path)
+            total -= size
+            logger.debug('Evicted {} from topology cache.'.format(path))
+        except OSError:
+            logger.warn('Unable to evict {} from topology cache.'.format(path))
+
+
+def clear():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,258 @@
+"""
+Distance limited grow along the mesh surface.
+
+A multi-source Dijkstra from the selected components over world space edge
+lengths gives the geodesic distance of every component. Components are kept
+sorted by that distance, so the selection for any radius is a bisect into the
+field instead of a new search. Edge lengths are cached per mesh until its
+topology or points change.
+
+Usage:
+
+    field = DistanceField(comp.dagpath, comp.type, comp.indices)
+    selection.extend([(comp.dagpath, comp.type, field.within(2.5))])
+
+"""
+import array
+import heapq
+import bisect
+import logging
+
+from PySide import QtCore, QtGui
+
+import maya.api.OpenMaya as api
+from maya.api.OpenMaya import MFn
+
+import mampy
+from mampy._old.utils import DraggerCtx, mvp
+from mampy.utils import undoable, repeatable
+from mampy.core.exceptions import NothingSelected, InvalidSelection
+
+from mamselect import selection, symmetry, topology
+from mamselect.bitset import Bitset
+
+logger = logging.getLogger(__name__)
+
+
+optionvar = mampy.optionVar()
+
+INFINITY = float('inf')
+
+_lengths = {}
+
+
+def get_edge_lengths(topo):
+    """Return world space edge lengths of topology."""
+    points = topo.points(api.MSpace.kWorld)
+    cached = _lengths.get(topo.name)
+    if cached is not None and cached[0] is topo.edge_verts and cached[1] == points:
+        return cached[2]
+
+    lengths = topo.edge_lengths(points)
+    _lengths[topo.name] = (topo.edge_verts, points, lengths)
+    return lengths
+
+
+def vert_distances(topo, lengths, seeds, radius=INFINITY):
+    """Return geodesic distance of each vertex to the closest seed vertex."""
+    distances = array.array('d', [INFINITY]) * topo.num_verts
+    heap = []
+    for vert in seeds:
+        distances[vert] = 0.0
+        heap.append((0.0, vert))
+    heapq.heapify(heap)
+
+    vert_edges, edge_verts = topo.vert_edges, topo.edge_verts
+    while heap:
+        distance, vert = heapq.heappop(heap)
+        if distance > distances[vert]:
+            continue
+        for edge in vert_edges[vert]:
+            v1, v2 = edge_verts[edge]
+            other = v2 if v1 == vert else v1
+            length = distance + lengths[edge]
+            if length < distances[other] and length <= radius:
+                distances[other] = length
+                heapq.heappush(heap, (length, other))
+    return distances
+
+
+class DistanceField(object):
+    """
+    Geodesic distance of the components of one mesh from a set of seeds.
+
+    A component is as far away as its farthest vertex, so seeds themselves
+    are at distance zero.
+    """
+
+    __slots__ = ('dagpath', 'type', 'size', 'order', 'distances')
+
+    def __init__(self, dagpath, comptype, indices, radius=INFINITY):
+        if comptype not in (MFn.kMeshVertComponent, MFn.kMeshEdgeComponent,
+                            MFn.kMeshPolygonComponent):
+            raise TypeError('Geodesic distance only exists for mesh verts, '
+                            'edges and faces.')
+        self.dagpath = topology.get_dagpath(dagpath)
+        self.type = comptype
+
+        topo = topology.get_topology(self.dagpath)
+        self.size = topo.count(comptype)
+        seeds = indices
+        if not comptype == MFn.kMeshVertComponent:
+            seeds = topo.convert(indices, comptype, MFn.kMeshVertComponent)
+        distances = vert_distances(topo, get_edge_lengths(topo), seeds, radius)
+
+        if not comptype == MFn.kMeshVertComponent:
+            distances = array.array('d', (
+                max(distances[v] for v in verts) if len(verts) else INFINITY
+                for verts in topo.table(comptype, MFn.kMeshVertComponent)
+            ))
+
+        order = sorted(
+            (i for i in xrange(len(distances)) if distances[i] < INFINITY),
+            key=distances.__getitem__
+        )
+        self.order = topology.int_array(order)
+        self.distances = array.array('d', (distances[i] for i in order))
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def max_distance(self):
+        return self.distances[-1] if self.distances else 0.0
+
+    def count(self, radius):
+        """Return number of components within radius."""
+        return bisect.bisect_right(self.distances, radius)
+
+    def within(self, radius):
+        """Return :class:`Bitset` of components within radius."""
+        return Bitset.from_indices(self.order[:self.count(radius)], self.size)
+
+    def region(self, radius):
+        return self.dagpath, self.type, self.within(radius)
+
+
+def get_field(dagpath, comptype, indices, radius=INFINITY):
+    try:
+        return DistanceField(dagpath, comptype, indices, radius)
+    except TypeError:
+        raise InvalidSelection('Selection must be mesh component.')
+
+
+def get_fields(complist, radius=INFINITY):
+    return [get_field(c.dagpath, c.type, c.indices, radius) for c in complist]
+
+
+@undoable()
+@repeatable
+def grow(radius, expand=True, mirror=False):
+    """
+    Grow selection by geodesic radius, or shrink it if not expand.
+
+    Shrinking seeds the field from the unselected components and keeps
+    selected components farther away than radius. With mirror the result is
+    mirrored across :data:`symmetry.AXIS`.
+    """
+    selected = mampy.complist()
+    if not selected:
+        raise NothingSelected()
+
+    if expand:
+        regions = [f.region(radius) for f in get_fields(selected, radius)]
+        selection.extend(symmetry.mirrored(regions) if mirror else regions)
+        return
+
+    regions = []
+    for comp in selected:
+        current = selection.get_bitset(comp.dagpath, comp.type)
+        field = get_field(comp.dagpath, comp.type, current.complement(), radius)
+        regions.append((comp.dagpath, comp.type, field.within(radius) & current))
+    selection.toggle(symmetry.mirrored_toggle(regions) if mirror else regions)
+
+
+class geodesic_grow(DraggerCtx):
+    """
+    Drag to grow selection by geodesic radius.
+
+    Distance fields are built once when the tool starts, dragging only
+    bisects them.
+    """
+
+    CONTEXT_NAME = 'mamtools_geodesic_grow_context'
+    OPTIONVAR_NAME = 'mamtools_geodesic_grow_radius'
+
+    def __init__(self, context=True, mirror=False):
+        super(geodesic_grow, self).__init__(self.CONTEXT_NAME)
+        self.mirror = mirror
+
+        selected = mampy.complist()
+        if not selected:
+            raise NothingSelected()
+
+        self.fields = get_fields(selected)
+        self.min = 0.0
+        self.max = max(f.max_distance for f in self.fields)
+        self.default = min(self.radius, self.max)
+        self.value = self.default
+        self._label = None
+
+        self._update()
+        if context:
+            self.run()
+        else:
+            self.tear_down()
+
+    @property
+    def radius(self):
+        return optionvar.get(self.OPTIONVAR_NAME, 1.0)
+
+    @radius.setter
+    def radius(self, value):
+        if not isinstance(value, (int, float)):
+            raise TypeError('Value needs to be int or float.')
+        optionvar[self.OPTIONVAR_NAME] = value
+
+    @property
+    def label(self):
+        if self._label is None:
+            self._label = QtGui.QLabel('radius: {}'.format(self.value))
+            self._label.setWindowFlags(QtCore.Qt.WindowStaysOnTopHint |
+                                       QtCore.Qt.FramelessWindowHint)
+            self._label.setAttribute(QtCore.Qt.WA_TranslucentBackground)
+        return self._label
+
+    def setup(self):
+        self.label.show()
+
+    def tear_down(self):
+        self.label.close()
+
+    def drag(self):
+        super(geodesic_grow, self).drag()
+
+        view = mvp.Viewport.active()
+        pos = (view.widget.width() / 2, view.widget.height() / 5)
+        pos = view.widget.mapToGlobal(QtCore.QPoint(*pos))
+        self.label.move(pos)
+        self.label.setText('radius: {:4.3f}'.format(self.value))
+        self.label.setMinimumSize(self.label.minimumSizeHint())
+
+    def drag_left(self):
+        # Full drag across 500 pixels covers the farthest reachable component.
+        change = (self.dragPoint[0] - self.anchorPoint[0]) * self.max * 0.002
+        self.value = max(self.min, min(self.max, change + self.default))
+        self._update()
+
+    def _update(self):
+        regions = [f.region(self.value) for f in self.fields]
+        selection.replace(symmetry.mirrored(regions) if self.mirror else regions)
+
+    def release(self):
+        self.default = self.value
+        self.radius = self.value
+
+
+if __name__ == '__main__':
+    geodesic_grow()
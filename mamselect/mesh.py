@@ -2,6 +2,7 @@
 Contains selection tools for working with meshes and surfaces.
 """
 import sys
+import math
 import logging
 import itertools
 import collections
@@ -12,14 +13,14 @@ from maya.api.OpenMaya import MFn
 import maya.api.OpenMaya as api
 
 import mampy
-from mampy.core.selectionlist import ComponentList
 from mampy.core.dagnodes import Node
-from mampy.core.components import SingleIndexComponent
 from mampy.core.exceptions import NothingSelected, InvalidSelection
-from mampy.utils import (get_active_flags_in_mask, get_object_under_cursor,
-                         undoable, repeatable)
+from mampy.utils import get_active_flags_in_mask, undoable, repeatable
 
 
+from mamselect import bvh, regions, scan, selection, symmetry, topology
+from mamselect.bitset import Bitset
+from mamselect.components import ComponentArrayList
 from mamselect.masks import set_selection_mask
 
 logger = logging.getLogger(__name__)
@@ -28,102 +29,130 @@ logger.setLevel(logging.INFO)
 optionvar = mampy.optionVar()
 
 
+def get_selected_regions():
+    """
+    Return mesh regions of the active selection.
+
+    Raises InvalidSelection when only non mesh items are selected, like mampy
+    did, and NothingSelected when the selection is empty.
+    """
+    selected = selection.get_regions()
+    if not selected:
+        if selection.OTHER:
+            raise InvalidSelection('Selection must be mesh component.')
+        raise NothingSelected()
+    return selected
+
+
+# Keyword arguments of :meth:`topology.MeshTopology.convert`.
+CONVERT_ARGUMENTS = ('border', 'internal')
+
+
 @undoable()
 @repeatable
-def adjacent():
+def adjacent(mirror=False):
     """Grow and remove previous selection to get adjacent selection.
 
+    With mirror the result is mirrored across :data:`symmetry.AXIS`.
+
     .. todo:: make contractable
     """
-    selected = mampy.complist()
-    if not selected:
-        raise NothingSelected()
+    selected = get_selected_regions()
 
-    toggle_components = ComponentList()
-    for each in selected:
+    regions = []
+    for name, comptype, bitset in selected:
         try:
-            adjacent_selection = {
-                MFn.kMeshPolygonComponent: each.to_edge().to_face(),
-                MFn.kMeshEdgeComponent: each.to_vert().to_edge(),
-                MFn.kMeshVertComponent: each.to_edge().to_vert(),
-                MFn.kMeshMapComponent: each.to_edge().to_map(),
-            }[each.type]
-            toggle_components.append(adjacent_selection)
-        except KeyError:
+            indices = topology.get_topology(name).adjacent(comptype, bitset)
+        except TypeError:
             raise InvalidSelection('Selection must be mesh component.')
+        regions.append((name, comptype, indices))
 
-    cmds.select(toggle_components.cmdslist(), toggle=True)
-
-
-def select_deselect_border_edge(root_edge, tolerance):
-
-    def get_vector_from_edge(edge, index):
-        p1, p2 = [edge.points[i] for i in edge.vertices[index]]
-        return p2 - p1
-
-    root_edge_vector = get_vector_from_edge(root_edge, root_edge.index)
-    edge_border_indices = cmds.polySelect(
-        root_edge.dagpath,
-        edgeBorder=root_edge.index,
-        noSelection=True
-    )
-    border_edge = root_edge.new().add(edge_border_indices)
-    edges_to_select = root_edge.new()
-    for idx in border_edge:
-        border_edge_vector = get_vector_from_edge(border_edge, idx)
-        if root_edge_vector.isParallel(border_edge_vector, tolerance):
-            edges_to_select.add(idx)
-
-    connected = edges_to_select.get_connected_components()
-    for e in connected:
-        if root_edge.index in e:
-            if root_edge in mampy.complist():
-                cmds.select(e.cmdslist(), d=True)
-            else:
-                cmds.select(e.cmdslist(), add=True)
+    if mirror:
+        regions = symmetry.mirrored_toggle(regions)
+    selection.toggle(regions)
 
 
-def select_deselect_edge_lists(root_edge, loop=True):
+def get_parallel_run(parallel, position, closed=True):
+    """
+    Return positions in a chain connected to position and flagged parallel.
+    """
+    count = len(parallel)
+    if all(parallel):
+        return range(count)
+
+    run = [position]
+    for step in (1, -1):
+        current = position + step
+        while True:
+            if closed:
+                current %= count
+            elif not 0 <= current < count:
+                break
+            if current == position or not parallel[current]:
+                break
+            run.append(current)
+            current += step
+    return run
+
+
+def select_deselect_border_edge(root_edge, tolerance, mirror=False):
+    topo = topology.get_topology(root_edge.dagpath)
+    loop, position = topo.border_loop(root_edge.index)
+
+    vectors = topo.edge_vectors(loop, topo.points())
+    rx, ry, rz = vectors[position * 3:position * 3 + 3]
+    parallel = []
+    for i in xrange(len(loop)):
+        x, y, z = vectors[i * 3:i * 3 + 3]
+        parallel.append(1.0 - abs(rx * x + ry * y + rz * z) <= tolerance)
+
+    run = get_parallel_run(parallel, position, topo.is_closed(loop))
+    add_remove_edges(root_edge, [loop[i] for i in run], mirror)
+
+
+def select_deselect_edge_lists(root_edge, loop=True, mirror=False):
     kw = {'edgeLoop' if loop else 'edgeRing': root_edge.index}
-    if root_edge in mampy.complist():
-        kw.update({'deselect': True})
-    else:
-        kw.update({'add': True})
-    cmds.polySelect(root_edge.dagpath, **kw)
+    edges = cmds.polySelect(root_edge.dagpath, noSelection=True, **kw) or []
+    add_remove_edges(root_edge, edges, mirror)
 
 
-def select_deselect_surrounded(root_comp):
-    selected = mampy.complist()
-    if not selected:
-        cmds.selecet(root_comp.get_complete().cmdslist(), add=True)
+def add_remove_edges(root_edge, edges, mirror=False):
+    """Remove edges if root_edge is selected, else add them."""
+    dagpath, comptype = root_edge.dagpath, root_edge.type
+    if mirror:
+        edges = symmetry.mirror_indices(dagpath, comptype, edges)
+    if selection.is_selected(dagpath, comptype, root_edge.index):
+        selection.remove(dagpath, comptype, edges)
     else:
-        for comp in selected:
-            # Find correct dagpath to work on
-            if not root_comp.dagpath == comp.dagpath:
-                continue
+        selection.add(dagpath, comptype, edges)
 
-            if comp.is_complete():
-                cmds.select(comp.cmdslist(), d=True)
-            else:
-                connected = list(comp.get_connected_components())
-                connected_unselected = list(comp.toggle().get_connected_components())
 
-                if any(root_comp.index in c for c in connected):
-                    kw = {'deselect': True}
-                    iterable = connected
-                elif any(root_comp.index in c for c in connected_unselected):
-                    kw = {'add': True}
-                    iterable = connected_unselected
+def select_deselect_surrounded(root_comp, mirror=False):
+    """Toggle the selected or unselected region containing root_comp."""
+    dagpath, comptype = root_comp.dagpath, root_comp.type
+    if not selection.get_regions():
+        count = selection.get_component_count(dagpath, comptype)
+        selection.add(dagpath, comptype, Bitset.full(count))
+        return
 
-                for c in iterable:
-                    if root_comp.index in c:
-                        cmds.select(c.cmdslist(), **kw)
+    selected = selection.get_bitset(dagpath, comptype)
+    if not selected:
+        return
+    if selected.is_complete():
+        selection.remove(dagpath, comptype, selected)
+        return
+
+    region = regions.get_regions(dagpath, comptype).region(root_comp.index)
+    toggled = [(dagpath, comptype, region)]
+    if mirror:
+        toggled = symmetry.mirrored_toggle(toggled)
+    selection.toggle(toggled)
 
 
 @undoable()
 @repeatable
-def select_deselect_isolated_components(loop=True, tolerance=0.35):
-    """Clear mesh or loop under mouse."""
+def select_deselect_isolated_components(loop=True, tolerance=0.35, mirror=False):
+    """Clear mesh or loop under mouse, on both sides of the mesh if mirror."""
     preselect = mampy.complist(preSelectHilite=True)
     if not preselect:
         raise NothingSelected()
@@ -131,13 +160,13 @@ def select_deselect_isolated_components(loop=True, tolerance=0.35):
     preselect_component = preselect.pop()
     if preselect_component.type == api.MFn.kMeshEdgeComponent:
         if not loop:
-            select_deselect_edge_lists(preselect_component, loop)
+            select_deselect_edge_lists(preselect_component, loop, mirror)
         elif preselect_component.is_border(preselect_component.index):
-            select_deselect_border_edge(preselect_component, tolerance)
+            select_deselect_border_edge(preselect_component, tolerance, mirror)
         else:
-            select_deselect_edge_lists(preselect_component, loop)
+            select_deselect_edge_lists(preselect_component, loop, mirror)
     else:
-        select_deselect_surrounded(preselect_component)
+        select_deselect_surrounded(preselect_component, mirror)
 
 
 @undoable()
@@ -146,7 +175,7 @@ def toggle_mesh_under_cursor():
     """Toggle mesh object under cursor."""
     preselect = mampy.complist(preSelectHilite=True)
     if not preselect:
-        under_cursor_mesh = get_object_under_cursor()
+        under_cursor_mesh = bvh.get_object_under_cursor()
         if under_cursor_mesh is None:
             return
         node = Node(under_cursor_mesh)
@@ -163,7 +192,7 @@ def toggle_mesh_under_cursor():
 @undoable()
 def deselect_all_but():
     preselect = mampy.complist(preSelectHilite=True)
-    obj = get_object_under_cursor()
+    obj = bvh.get_object_under_cursor()
     if not obj:
         return
 
@@ -175,9 +204,11 @@ def deselect_all_but():
 
 
 @undoable()
-def convert(comptype, **convert_arguments):
+def convert(comptype, mirror=False, **convert_arguments):
     """
     Convert current selection to given comptype.
+
+    With mirror the result is mirrored across :data:`symmetry.AXIS`.
     """
     ComponentType = collections.namedtuple('ComponentType', ('type', 'function'))
     convert_mode = {
@@ -187,35 +218,82 @@ def convert(comptype, **convert_arguments):
         'map': ComponentType(api.MFn.kMeshMapComponent, 'to_map'),
     }[comptype]
 
-    selected, converted = mampy.complist(), ComponentList()
-    if not selected:
-        raise NothingSelected()
-
-    for comp in selected:
-        if comp.type == convert_mode:
-            continue
-        converted.append(getattr(comp, convert_mode.function)(**convert_arguments))
-
+    if not set(convert_arguments).issubset(CONVERT_ARGUMENTS):
+        # Fall back to mampy for conversion arguments the topology can't answer.
+        selected, converted = mampy.complist(), ComponentArrayList()
+        if not selected:
+            raise NothingSelected()
+        for comp in selected:
+            if not comp.type == convert_mode.type:
+                comp = getattr(comp, convert_mode.function)(**convert_arguments)
+            converted.append(comp)
+        regions = converted.regions()
+    else:
+        selected = get_selected_regions()
+        regions = []
+        for name, source, bitset in selected:
+            if not source == convert_mode.type:
+                bitset = topology.get_topology(name).convert(
+                    bitset, source, convert_mode.type, **convert_arguments
+                )
+            regions.append((name, convert_mode.type, bitset))
+
+    if mirror:
+        regions = symmetry.mirrored(regions)
     set_selection_mask(comptype)
-    cmds.select(converted.cmdslist())
+    selection.replace(regions)
 
 
 @undoable()
 @repeatable
-def flood():
-    """Get contiguous components from current selection."""
-    selected = mampy.complist()
-    if not selected:
-        raise NothingSelected()
+def flood(angle=None, hard=False, mirror=False):
+    """
+    Get contiguous components from current selection.
+
+    With an angle in degrees the flood stops at edges whose dihedral angle is
+    above it, with hard it also stops at hard and creased edges. Uvs always
+    flood to their shell. With mirror the result is mirrored across
+    :data:`symmetry.AXIS`.
+    """
+    selected = get_selected_regions()
 
-    flood = ComponentList()
-    for comp in selected:
-        if comp.type == MFn.kMeshMapComponent:
-            iter_ = comp.map_shells
+    # Flooded components contain the selection, so streaming them in as
+    # additions gives the same result as replacing it.
+    chunks = _flood_chunks(selected, angle, hard)
+    if mirror:
+        chunks = symmetry.mirrored_chunks(chunks)
+    selection.stream(chunks)
+
+
+def _flood_chunks(selected, angle, hard):
+    for name, comptype, bitset in selected:
+        topo = topology.get_topology(name)
+        if (angle is None and not hard) or comptype == api.MFn.kMeshMapComponent:
+            indices = topo.iter_shell_members(comptype, bitset)
         else:
-            iter_ = comp.mesh_shells
-        flood.extend(iter_.itervalues())
-    cmds.select(flood.cmdslist())
+            face = api.MFn.kMeshPolygonComponent
+            faces = bitset
+            if not comptype == face:
+                faces = topo.convert(bitset, comptype, face)
+            radians = math.pi if angle is None else math.radians(angle)
+            dihedral = topo.dihedral_index(hard)
+            if comptype == face:
+                indices = dihedral.iter_members(faces, radians)
+            else:
+                indices = topo.convert(dihedral.members(faces, radians), face, comptype)
+        for chunk in selection.chunked(i for i in indices if i not in bitset):
+            yield name, comptype, chunk
+
+
+def _invert_chunks(selected, shell):
+    for name, comptype, bitset in selected:
+        topo = topology.get_topology(name)
+        if shell:
+            indices = topo.iter_shell_members(comptype, bitset)
+        else:
+            indices = xrange(bitset.size)
+        for chunk in selection.chunked(i for i in indices if i not in bitset):
+            yield name, comptype, chunk
 
 
 @undoable()
@@ -259,7 +337,8 @@ def poly_invert(shell=False):
     Invert selection.
 
     If shell is active but there are no selections, script assumes we
-    want a full invert.
+    want a full invert. With shell uvs invert within their uv shell rather
+    than the mesh shell, matching how :func:`flood` treats them.
 
     .. note:: If current selection mask is *object* and there are no
         selections there is no way that I know of to find out the active
@@ -267,11 +346,15 @@ def poly_invert(shell=False):
     """
     # To find out how we want to operate on the objects we walk through
     # the possible outcomes leaving the object list at last.
-    modes = [mampy.complist(), mampy.daglist(hl=True), mampy.daglist()]
-    for mode, selected in enumerate(modes):
-        if not selected:
-            continue
-        break
+    selected = selection.get_regions()
+    if selected:
+        mode = 0
+    else:
+        modes = [mampy.daglist(hl=True), mampy.daglist()]
+        for mode, selected in enumerate(modes, 1):
+            if not selected:
+                continue
+            break
 
     if mode == 2:
         if not selected:
@@ -289,18 +372,28 @@ def poly_invert(shell=False):
                 }[mask]; break
             except KeyError:
                 continue
-        for dag in selected:
-            component = SingleIndexComponent.create(dag.dagpath, active_mask)
-            cmds.select(component.get_complete().cmdslist(), toggle=True)
+        # Nothing is selected on hilited meshes, so the invert is all of them.
+        counts = [
+            (dagpath, selection.get_component_count(dagpath, active_mask))
+            for dagpath in topology.get_meshes(dag.dagpath for dag in selected)
+        ]
+        selection.stream((
+            (dagpath, active_mask, chunk)
+            for dagpath, count in counts
+            for chunk in selection.chunked(xrange(count))
+        ), total=sum(count for _, count in counts))
     if mode == 0:
-        selection_list = ComponentList()
-        for comp in selected:
-            if shell:
-                for mesh in comp.mesh_shells.itervalues():
-                    selection_list.append(mesh)
-            else:
-                selection_list.append(comp.get_complete())
-        cmds.select(selection_list.cmdslist(), toggle=True)
+        # Removing the selection and streaming in the rest of its region keeps
+        # the complement from existing as a whole.
+        selection.stream((
+            (name, comptype, chunk)
+            for name, comptype, bitset in selected
+            for chunk in selection.chunked(bitset)
+        ), deselect=True, total=sum(len(bitset) for _, _, bitset in selected))
+        total = None
+        if not shell:
+            total = sum(bitset.size - len(bitset) for _, _, bitset in selected)
+        selection.stream(_invert_chunks(selected, shell), total=total)
 
 
 @undoable()
@@ -308,23 +401,18 @@ def poly_invert(shell=False):
 def nonquads(ngons=True, query=False):
     """
     Select all nonquads from an object.
-    """
-    type_ = 3 if ngons else 1
 
+    In query mode the faces are returned without touching the selection.
+    """
+    metric = 'ngons' if ngons else 'tris'
+    results = scan.scan(metrics=(metric,))
     if query:
-        selected = mampy.daglist()
+        return scan.to_complist(results, metric)
 
     cmds.selectMode(component=True)
     cmds.selectType(facet=True)
-
-    cmds.polySelectConstraint(mode=3, t=0x0008, size=type_)
-    cmds.polySelectConstraint(disable=True)
-    ngons = mampy.daglist()
-
-    if query:
-        cmds.select(selected.cmdslist())
-        return ngons
-    sys.stdout.write(str(len(ngons)) + ' N-Gon(s) Selected.\n')
+    count = scan.select(results, metric)
+    sys.stdout.write(str(count) + ' N-Gon(s) Selected.\n')
 
 
 @undoable()
@@ -12,50 +12,92 @@ from maya.api.OpenMaya import MFn
 import mampy
 from mampy._old.containers import SelectionList
 
+from mamselect import selection, symmetry, topology
+from mamselect.bitset import Bitset
+
 logger = logging.getLogger(__name__)
 
 
 class WalkSelection(object):
+    """
+    Walk along a pattern, adding or removing elements as it goes.
+
+    The pattern is kept as a flat index array. :meth:`get` hands back the walk
+    from the previous keypress as long as the mesh topology is unchanged and
+    the walk's current element is still selected.
+    """
 
     instance = None
 
     def __init__(self):
-
-        self._pattern = None
-
         self._walkobject = WalkPattern()
+        self.dagpath = self._walkobject.comp.dagpath
+        self.comptype = self._walkobject.comp.type
+        self.pattern = self._walkobject.pattern
         self.index = self._walkobject.current_index
+        self._signature = self._get_signature()
 
     def __len__(self):
-        try:
-            return len(self.pattern)
-        except TypeError:
-            return 0
+        return len(self.pattern)
 
-    @property
-    def pattern(self):
-        if self._pattern is None:
-            self._pattern = self._walkobject.pattern
-        return self._pattern
+    @classmethod
+    def get(cls):
+        """Return walk from last call if still valid, else start a new one."""
+        if cls.instance is None or not cls.instance.is_valid():
+            cls.instance = cls()
+        return cls.instance
+
+    def _get_signature(self):
+        topo = topology.get_topology(self.dagpath)
+        return id(topo), topo.num_verts, topo.num_edges, topo.num_faces
+
+    def is_valid(self):
+        if not len(self) or not self._get_signature() == self._signature:
+            return False
+        current = self.pattern[self.index]
+        return selection.is_selected(self.dagpath, self.comptype, current)
+
+    def select(self):
+        """Add the whole pattern to the selection."""
+        selection.add(self.dagpath, self.comptype, self.pattern)
+
+    def _elements(self, positions, mirror):
+        elements = [self.pattern[i] for i in positions]
+        if mirror:
+            return symmetry.mirror_indices(self.dagpath, self.comptype, elements)
+        return elements
+
+    def next(self, steps=1, mirror=False):
+        """Walk forward, adding the next steps elements in one commit."""
+        steps = min(steps, len(self) - 1)
+        if steps < 1:
+            return
+        positions = [(self.index + i) % len(self) for i in xrange(1, steps + 1)]
+        self.index = positions[-1]
+        selection.add(self.dagpath, self.comptype, self._elements(positions, mirror))
+
+    def prev(self, steps=1, mirror=False):
+        """Walk backward, removing the last steps elements in one commit."""
+        steps = min(steps, len(self) - 1)
+        if steps < 1:
+            return
+        positions = [(self.index - i) % len(self) for i in xrange(steps)]
+        self.index = (self.index - steps) % len(self)
+        selection.remove(self.dagpath, self.comptype, self._elements(positions, mirror))
 
-    def walk(self, backwards=False):
-        index = self.index + (-1 if backwards else 1)
+    def to_end(self):
+        self.next(len(self) - 1 - self.index)
 
-        if index == len(self) or index < -len(self):
-            index = -1 if backwards else 0
+    def to_start(self):
+        self.prev(self.index)
 
-        self.index = index
 
-    def update(self):
-        self.index = self.pattern.current_index()
+def walk_next(steps=1, mirror=False):
+    WalkSelection.get().next(steps, mirror)
 
-    def next(self):
-        self.walk()
-        cmds.select(str(self.pattern[self.index]), add=True)
 
-    def prev(self):
-        self.walk(backwards=True)
-        cmds.select(str(self.pattern[self.index+1]), d=True)
+def walk_prev(steps=1, mirror=False):
+    WalkSelection.get().prev(steps, mirror)
 
 
 class WalkPattern(collections.Sequence):
@@ -127,17 +169,15 @@ class WalkPattern(collections.Sequence):
     @property
     def pattern(self):
         if self._pattern is None:
-            self._pattern = SelectionList()
-            for idx in self.walklist:
-                new = self.comp.new()
-                new.add(idx)
-                self._pattern.append(new)
+            self._pattern = topology.int_array(self.walklist)
         return self._pattern
 
     def setup(self):
         self._create_elements()
 
-        if (self.start_idx > self.end_idx and
+        # Uv loops are walked in order from the start index already.
+        if (not self.comp.type == MFn.kMeshMapComponent and
+                self.start_idx > self.end_idx and
                 not self.end_idx == self.walklist[0]):
             self.walklist.reverse()
         self._slide_walklist()
@@ -168,11 +208,12 @@ class WalkPattern(collections.Sequence):
                 loop = cmds.polySelectSp(list(self.slist), q=True, loop=True)
                 loop = cmds.polySelectSp(loop, q=True, loop=True)
             else:
-                loop = cmds.polySelect(
-                    q=True, shortestEdgePathUV=self.comp.indices
-                    )
-                loop = cmds.polySelect(q=True, ass=True, euv=loop)
-                loop = cmds.polyListComponentConversion(loop, tuv=True)
+                uv = topology.get_topology(self.comp.dagpath).uv
+                path = uv.path(self.start_idx, self.end_idx)
+                if len(path) < 2:
+                    raise ValueError('Unable to find loop from selection.')
+                self.walklist = uv.loop(path[0], path[1])
+                loop = self.comp.new().add(self.walklist).cmdslist()
         elif self.comp.type == MFn.kMeshEdgeComponent:
             loop = cmds.polySelect(q=True, ass=True, rpt=self.comp.indices)
             if not loop:
@@ -184,63 +225,97 @@ class WalkPattern(collections.Sequence):
         return self.__class__()
 
 
-current_pattern = []
-def flood(add=False):
-    global current_pattern
+# Number of flood steps kept for repeat detection and stepping back.
+HISTORY_SIZE = 32
+HISTORY = selection.SelectionHistory(HISTORY_SIZE)
+
 
+def flood(add=False):
     selected = mampy.complist(os=True)
-    print len(selected)
+    logger.debug('{} components selected.'.format(len(selected)))
     if not len(selected) > 2:
-        current_pattern = []
+        HISTORY.clear()
     pattern = selected[-2:]
 
-    if current_pattern and current_pattern[-1] == selected:
-        print 'yeah lets do it'
-        if not len(current_pattern) >= 2:
+    if HISTORY.is_repeat(selection.Snapshot.from_active()):
+        if not len(HISTORY) >= 2:
             return
-        # try to get new pattern
-        complist1, complist2 = current_pattern[-1], current_pattern[-2]
-        for component in complist2:
-            complist1.toggle(component.node)
-
-        for comp1, comp2 in zip(complist1, complist2):
-            for c in comp1:
-                for d in comp2:
-                    p = comp1.new().add(c).add(d)
-                    result = cmds.polySelectSp(p.cmdslist(), q=True, loop=True) or []
-                    if result:
-                        result = mampy.complist(result).pop()
-                        jumps = len(result)-1
-                        result = cmds.polySelectSp(result.cmdslist(), q=True, loop=True)
-
-                        result = mampy.complist(result, fl=True)
-                        rotate = [i.index for i in result].index(c)
-                        de = collections.deque(result)
-                        de.rotate(-rotate)
-                        # print de
-
-                        mod = len(de) % jumps
-                        ls =list(de)[::jumps]
-                        if mod:
-                            ls = ls[:-mod]
-                        for i in ls:
-                            cmds.select(i.cmdslist(), add=True)
-
-                        break
-
+        extrapolate(HISTORY[-2], HISTORY[-1])
     else:
-        print 'lets be boring'
-        cmds.select(pattern.cmdslist())
-        walk = WalkSelection()
-        cmds.select(walk.pattern)
-        if current_pattern and add:
-            cmds.select(current_pattern[-1].cmdslist(), add=True)
-        current_pattern.append(mampy.complist())
-
-
-
+        selection.replace(selection.from_complist(pattern))
+        walk = WalkSelection.instance = WalkSelection()
+        walk.select()
+        if HISTORY and add:
+            selection.extend(HISTORY[-1].regions())
+        HISTORY.push(selection.Snapshot.from_active())
+
+
+def extrapolate(previous, current):
+    """
+    Continue the pattern between two snapshots along their shared loops.
+
+    Components added in the current step are paired with the closest earlier
+    component on a shared loop; the distance between them is the stride used to
+    pick every n:th element of that loop. Everything found is committed in one
+    selection call.
+    """
+    previous, current = previous.bitsets(), current.bitsets()
+    regions = []
+    for (name, comptype), bitset in current.iteritems():
+        old = previous.get((name, comptype))
+        if old is None:
+            continue
+        new = bitset - old
+        if not new:
+            continue
+
+        loops = topology.get_topology(name).loops(comptype)
+        found = Bitset(bitset.size)
+        for comp in new:
+            pair = get_stride(loops, comp, old)
+            if pair is not None:
+                found.update(loops.every_nth(pair[0], comp, pair[1]))
+        regions.append((name, comptype, found))
+    selection.extend(regions)
+
+
+def get_stride(loops, comp, old):
+    """
+    Return ``(loop, stride)`` to the closest old component sharing a loop.
+
+    Every pair of comp and an old component is measured along the loops they
+    share, so at crossings the loop actually running through the pair wins.
+    Returns None if no old component lies on a loop through comp.
+    """
+    others = set()
+    for loop in loops.element_loops[comp]:
+        others.update(other for other in loops.loops[loop] if other in old)
+
+    pairs = [
+        (loops.distance(loop, comp, other), loop)
+        for other in others for loop in loops.shared(comp, other)
+    ]
+    if not pairs:
+        return None
+    stride, loop = min(pairs)
+    return loop, stride
+
+
+def flood_back(steps=1):
+    """Step back through flood history and select that step."""
+    snapshot = HISTORY.back(steps)
+    if snapshot is None:
+        return
+    selection.replace(snapshot.regions())
+
+
+def flood_forward(steps=1):
+    """Step forward through flood history and select that step."""
+    snapshot = HISTORY.forward(steps)
+    if snapshot is None:
+        return
+    selection.replace(snapshot.regions())
 
 
 if __name__ == '__main__':
-    walk = WalkSelection()
-    cmds.select(walk.pattern)
+    WalkSelection.get().select()
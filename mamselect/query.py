@@ -0,0 +1,98 @@
+"""
+Side effect free queries for pipeline validation.
+
+Every function takes a mesh, given as a dagpath, node name,
+:class:`topology.MeshTopology` or a ``(counts, vertices[, points])`` tuple of
+raw arrays, and returns plain index lists. Nothing here touches the selection,
+selection masks or the undo queue, so it's safe to run in mayapy.
+
+Usage:
+
+    query.ngons('|asset_GEO|asset_GEOShape')
+    query.validate((counts, vertices, points))
+
+"""
+import logging
+
+from mamselect import scan, topology
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CHECKS = ('ngons', 'tris', 'lamina', 'nonmanifold', 'zero_area',
+                  'shells', 'border_loops')
+
+
+def get_topology(mesh):
+    """Return :class:`topology.MeshTopology` for any supported mesh input."""
+    if isinstance(mesh, topology.MeshTopology):
+        return mesh
+    if isinstance(mesh, tuple):
+        return topology.MeshTopology.from_arrays(*mesh)
+    return topology.get_topology(mesh)
+
+
+def scan_mesh(mesh, metrics=None):
+    return scan.scan_topology(get_topology(mesh), metrics=metrics)
+
+
+def ngons(mesh):
+    return scan_mesh(mesh, ('ngons',)).ngons
+
+
+def tris(mesh):
+    return scan_mesh(mesh, ('tris',)).tris
+
+
+def shells(mesh):
+    """Return list of face index lists, one per mesh shell."""
+    topo = get_topology(mesh)
+    labels = topo.vert_shells
+    result = {}
+    for face, verts in enumerate(topo.face_verts):
+        result.setdefault(labels[verts[0]], []).append(face)
+    return [result[label] for label in sorted(result)]
+
+
+def shell_count(mesh):
+    return len(shells(mesh))
+
+
+def border_loops(mesh):
+    """Return ordered border edge chains."""
+    return [list(loop) for loop in get_topology(mesh).border_loops[0]]
+
+
+def coplanar_groups(mesh, threshold=0.1):
+    """
+    Return list of face index lists of the mesh's planar patches.
+
+    This is :meth:`MeshTopology.planar_patches` at threshold with no plane
+    offset limit: each group grows over edge connected faces from the lowest
+    unassigned face index, taking faces whose normal lies within threshold of
+    that seed's normal. Membership therefore depends on seed order, a face
+    close to two groups lands in whichever is seeded first.
+    """
+    patches = get_topology(mesh).planar_patches(threshold, float('inf'))
+    return [list(row) for row in patches.patches]
+
+
+def validate(mesh, checks=DEFAULT_CHECKS):
+    """
+    Return dict of check name to result for a single mesh.
+
+    Only the scan metrics named in checks are computed, ``zero_area`` is None
+    for meshes given without points.
+    """
+    topo = get_topology(mesh)
+    metrics = [check for check in checks if check in scan.METRIC_TYPES]
+    result = scan.scan_topology(topo, metrics=metrics) if metrics else None
+    report = {}
+    for check in checks:
+        if check in scan.METRIC_TYPES:
+            report[check] = scan.get_indices(result, check)
+        elif check == 'coplanar_groups':
+            report[check] = coplanar_groups(topo)
+        else:
+            report[check] = globals()[check](topo)
+    return report
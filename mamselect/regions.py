@@ -0,0 +1,68 @@
+"""
+Connected regions of a component selection.
+
+The selection and its complement are labelled in one pass over the cached
+neighbour table of a mesh, so finding the region a component belongs to is a
+single lookup. Labels are kept until the selection or topology changes.
+
+Usage:
+
+    regions = get_regions(comp.dagpath, comp.type)
+    region = regions.region(comp.index)
+    selection.toggle([(comp.dagpath, comp.type, region)])
+
+"""
+import logging
+
+from mamselect import selection, topology
+from mamselect.bitset import Bitset
+
+logger = logging.getLogger(__name__)
+
+
+class Regions(object):
+    """Region labels of selected and unselected components of one mesh."""
+
+    __slots__ = ('links', 'selected', 'labels')
+
+    def __init__(self, links, selected):
+        self.links = links
+        self.selected = selected.copy()
+        self.labels = topology.label_components(links, self.selected)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def is_valid(self, links, selected):
+        return self.links is links and self.selected == selected
+
+    def is_selected(self, index):
+        return index in self.selected
+
+    def region(self, index):
+        """Return :class:`Bitset` of region containing index."""
+        labels, label = self.labels, self.labels[index]
+        return Bitset.from_indices(
+            (i for i in xrange(len(labels)) if labels[i] == label), len(labels)
+        )
+
+
+_cache = {}
+
+
+def get_regions(dagpath, comptype):
+    """Return :class:`Regions` for the current selection on mesh."""
+    dagpath = topology.get_dagpath(dagpath)
+    links = topology.get_topology(dagpath).links(comptype)
+    selected = selection.get_bitset(dagpath, comptype)
+
+    key = (dagpath.fullPathName(), comptype)
+    regions = _cache.get(key)
+    if regions is None or not regions.is_valid(links, selected):
+        regions = _cache[key] = Regions(links, selected)
+        logger.debug('Labelled regions of {}'.format(key))
+    return regions
+
+
+def clear():
+    _cache.clear()
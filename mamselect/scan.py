@@ -0,0 +1,174 @@
+"""
+Topology checks run over cached mesh arrays.
+
+Scanning never touches the scene selection or selection masks, results are
+plain index lists per mesh which can be selected afterwards on request.
+
+Usage:
+
+    results = scan(mampy.daglist())
+    print sum(len(r.ngons) for r in results)
+    select(results, 'ngons')
+
+"""
+import math
+import logging
+import collections
+
+from maya.api.OpenMaya import MFn
+
+import mampy
+from mampy.core.selectionlist import ComponentList
+from mampy.core.components import SingleIndexComponent
+
+from mamselect import selection, topology
+
+logger = logging.getLogger(__name__)
+
+
+AREA_TOLERANCE = 1e-8
+
+ScanResult = collections.namedtuple('ScanResult', (
+    'dagpath', 'tris', 'quads', 'ngons', 'poles', 'lamina', 'nonmanifold',
+    'zero_area',
+))
+
+METRIC_TYPES = {
+    'tris': MFn.kMeshPolygonComponent,
+    'quads': MFn.kMeshPolygonComponent,
+    'ngons': MFn.kMeshPolygonComponent,
+    'lamina': MFn.kMeshPolygonComponent,
+    'zero_area': MFn.kMeshPolygonComponent,
+    'nonmanifold': MFn.kMeshEdgeComponent,
+    'poles': MFn.kMeshVertComponent,
+}
+
+
+def scan_topology(topo, area_tolerance=AREA_TOLERANCE, metrics=None):
+    """
+    Return :class:`ScanResult` for a :class:`topology.MeshTopology`.
+
+    Only the given metrics are computed, all of them by default, and the
+    others are left None. ``zero_area`` is left None for topology without
+    points.
+    """
+    metrics = set(METRIC_TYPES if metrics is None else metrics)
+    tris = quads = ngons = poles = lamina = nonmanifold = zero_area = None
+
+    if metrics.intersection(('tris', 'quads', 'ngons')):
+        tris, quads, ngons = [], [], []
+        by_count = {3: tris, 4: quads}
+        for face, count in enumerate(topo.face_verts.counts()):
+            by_count.get(count, ngons).append(face)
+
+    if 'poles' in metrics:
+        poles = get_poles(topo)
+
+    if 'lamina' in metrics:
+        found, seen = set(), {}
+        for face, verts in enumerate(topo.face_verts):
+            other = seen.setdefault(frozenset(verts), face)
+            if not other == face:
+                found.update((other, face))
+        lamina = sorted(found)
+
+    if 'nonmanifold' in metrics:
+        nonmanifold = [
+            edge for edge, count in enumerate(topo.edge_faces.counts()) if count > 2
+        ]
+
+    if 'zero_area' in metrics and topo.has_points():
+        vectors = topo.face_vectors(topo.points())
+        zero_area = []
+        for face in xrange(topo.num_faces):
+            x, y, z = vectors[face * 3:face * 3 + 3]
+            if math.sqrt(x * x + y * y + z * z) * 0.5 <= area_tolerance:
+                zero_area.append(face)
+
+    return ScanResult(topo.dagpath, tris, quads, ngons, poles, lamina,
+                      nonmanifold, zero_area)
+
+
+def get_poles(topo):
+    """
+    Return dict of valence to irregular vertices.
+
+    Regular vertices have a valence of 4 inside the mesh, 3 on a border and
+    2 on a border corner.
+    """
+    border = set()
+    for edge, count in enumerate(topo.edge_faces.counts()):
+        if count == 1:
+            border.update(topo.edge_verts[edge])
+
+    poles = collections.defaultdict(list)
+    face_counts = topo.vert_faces.counts()
+    for vert, valence in enumerate(topo.vert_edges.counts()):
+        if vert not in border:
+            expected = 4
+        else:
+            expected = 2 if face_counts[vert] == 1 else 3
+        if valence and not valence == expected:
+            poles[valence].append(vert)
+    return dict(poles)
+
+
+def scan(objects=None, area_tolerance=AREA_TOLERANCE, metrics=None):
+    """
+    Scan given objects, defaults to selected and hilited objects.
+
+    Returns list of :class:`ScanResult`, one per mesh.
+    """
+    if objects is None:
+        objects = list(mampy.daglist()) + list(mampy.daglist(hl=True))
+        objects = [dag.dagpath for dag in objects]
+    return [
+        scan_topology(topology.get_topology(dagpath), area_tolerance, metrics)
+        for dagpath in topology.get_meshes(objects)
+    ]
+
+
+def get_indices(result, metric):
+    indices = getattr(result, metric)
+    if metric == 'poles' and indices is not None:
+        indices = sorted(i for verts in indices.itervalues() for i in verts)
+    return indices
+
+
+def count_indices(result, metric):
+    """Return number of indices of metric without gathering them."""
+    indices = getattr(result, metric)
+    if indices is None:
+        return 0
+    if metric == 'poles':
+        return sum(len(verts) for verts in indices.itervalues())
+    return len(indices)
+
+
+def to_complist(results, metric):
+    """Return :class:`ComponentList` of given metric from scan results."""
+    comptype = METRIC_TYPES[metric]
+    complist = ComponentList()
+    for result in results:
+        indices = get_indices(result, metric)
+        if not indices:
+            continue
+        comp = SingleIndexComponent.create(result.dagpath, comptype)
+        complist.append(comp.add(indices))
+    return complist
+
+
+def iter_chunks(results, metric):
+    """Yield ``(dagpath, comptype, indices)`` chunks of metric from scan results."""
+    comptype = METRIC_TYPES[metric]
+    for result in results:
+        for chunk in selection.chunked(get_indices(result, metric) or ()):
+            yield result.dagpath, comptype, chunk
+
+
+def select(results, metric, add=False):
+    """Select given metric from scan results, return number selected."""
+    if not add:
+        selection.clear()
+    total = sum(count_indices(result, metric) for result in results)
+    return selection.stream(iter_chunks(results, metric), total=total)
@@ -0,0 +1,501 @@
+"""
+Mirror of the active component selection as per mesh bitsets.
+
+Reading the active selection through mampy materializes every selected
+component. Here the selection is read once into a :class:`Bitset` per mesh and
+component type and kept in sync: Maya's SelectionChanged event marks the mirror
+stale, selections committed through this module update it in place.
+
+Usage:
+
+    selection.is_selected(comp.dagpath, comp.type, comp.index)
+    selection.add(comp.dagpath, comp.type, [0, 1, 2])
+
+"""
+import logging
+import itertools
+import contextlib
+import collections
+
+from maya import cmds
+from maya.OpenMaya import MEventMessage
+import maya.api.OpenMaya as api
+from maya.api.OpenMaya import MFn
+
+from mamselect.bitset import Bitset
+from mamselect.topology import get_dagpath, int_array
+
+logger = logging.getLogger(__name__)
+
+
+COMPONENT_NAMES = {
+    MFn.kMeshVertComponent: 'vtx',
+    MFn.kMeshEdgeComponent: 'e',
+    MFn.kMeshPolygonComponent: 'f',
+    MFn.kMeshMapComponent: 'map',
+}
+
+# Indices per chunk handed from query stages to :func:`stream`.
+CHUNK_SIZE = 65536
+# Components collected in a MSelectionList before it is committed.
+BATCH_SIZE = 1000000
+# Components committed before :func:`progress` opens its window.
+PROGRESS_THRESHOLD = 100000
+
+SELECT_CHANGE_EVENT = None
+MIRROR = {}
+# Selected items that aren't mesh components, e.g. transforms.
+OTHER = []
+STALE = True
+SUPPRESS = 0
+
+
+def on_selection_changed(*args):
+    global STALE
+    if not SUPPRESS:
+        STALE = True
+
+
+def create_select_change_event():
+    global SELECT_CHANGE_EVENT
+    if SELECT_CHANGE_EVENT:
+        return True
+    SELECT_CHANGE_EVENT = MEventMessage.addEventCallback('SelectionChanged',
+                                                         on_selection_changed)
+
+
+@contextlib.contextmanager
+def suppressed():
+    """Keep own selection commits from marking the mirror stale."""
+    global SUPPRESS
+    SUPPRESS += 1
+    try:
+        yield
+    finally:
+        SUPPRESS -= 1
+
+
+def get_component_count(dagpath, comptype):
+    mesh = api.MFnMesh(dagpath)
+    return {
+        MFn.kMeshVertComponent: lambda: mesh.numVertices,
+        MFn.kMeshEdgeComponent: lambda: mesh.numEdges,
+        MFn.kMeshPolygonComponent: lambda: mesh.numPolygons,
+        MFn.kMeshMapComponent: mesh.numUVs,
+    }[comptype]()
+
+
+def component_strings(dagpath, comptype, ranges):
+    """Return cmds component strings for inclusive index ranges."""
+    name = '{}.{}'.format(get_dagpath(dagpath).fullPathName(),
+                          COMPONENT_NAMES[comptype])
+    return [
+        '{}[{}]'.format(name, start) if start == end else
+        '{}[{}:{}]'.format(name, start, end)
+        for start, end in ranges
+    ]
+
+
+def refresh():
+    """Read active selection into the mirror."""
+    global STALE
+    create_select_change_event()
+    MIRROR.clear()
+    del OTHER[:]
+
+    active = api.MGlobal.getActiveSelectionList()
+    for i in xrange(active.length()):
+        try:
+            dagpath, component = active.getComponent(i)
+        except (RuntimeError, TypeError):
+            OTHER.extend(active.getSelectionStrings(i))
+            continue
+        comptype = component.apiType()
+        if component.isNull() or comptype not in COMPONENT_NAMES:
+            OTHER.extend(active.getSelectionStrings(i))
+            continue
+
+        dagpath = get_dagpath(dagpath)
+        key = (dagpath.fullPathName(), comptype)
+        if key not in MIRROR:
+            MIRROR[key] = Bitset(get_component_count(dagpath, comptype))
+        MIRROR[key].update(api.MFnSingleIndexedComponent(component).getElements())
+    STALE = False
+
+
+def get_mirror():
+    if STALE or not SELECT_CHANGE_EVENT:
+        refresh()
+    return MIRROR
+
+
+def get_regions():
+    """Return ``(name, comptype, Bitset)`` regions of the active selection."""
+    return [
+        (name, comptype, bitset)
+        for (name, comptype), bitset in get_mirror().iteritems() if bitset
+    ]
+
+
+def get_bitset(dagpath, comptype):
+    """Return selected indices of mesh as :class:`Bitset`."""
+    dagpath = get_dagpath(dagpath)
+    key = (dagpath.fullPathName(), comptype)
+    mirror = get_mirror()
+    if key not in mirror:
+        return Bitset(get_component_count(dagpath, comptype))
+    return mirror[key]
+
+
+def is_selected(dagpath, comptype, index):
+    return index in get_bitset(dagpath, comptype)
+
+
+def is_complete(dagpath, comptype):
+    return get_bitset(dagpath, comptype).is_complete()
+
+
+def _commit(dagpath, comptype, indices, **kwargs):
+    bitset = indices
+    if not isinstance(bitset, Bitset):
+        bitset = Bitset.from_indices(indices, get_component_count(dagpath, comptype))
+    if not bitset:
+        return bitset
+
+    with suppressed():
+        cmds.select(component_strings(dagpath, comptype, bitset.ranges()), **kwargs)
+    return bitset
+
+
+def add(dagpath, comptype, indices):
+    """Add indices to selection and mirror."""
+    bitset = _commit(dagpath, comptype, indices, add=True)
+    if not STALE:
+        key = (get_dagpath(dagpath).fullPathName(), comptype)
+        MIRROR[key] = MIRROR[key] | bitset if key in MIRROR else bitset
+    return bitset
+
+
+def remove(dagpath, comptype, indices):
+    """Remove indices from selection and mirror."""
+    bitset = _commit(dagpath, comptype, indices, deselect=True)
+    if not STALE:
+        key = (get_dagpath(dagpath).fullPathName(), comptype)
+        if key in MIRROR:
+            MIRROR[key] = MIRROR[key] - bitset
+    return bitset
+
+
+def toggle(regions):
+    """
+    Toggle regions in at most two selection commits.
+
+    ``regions`` is an iterable of ``(dagpath, comptype, Bitset)``. Only the
+    range compressed additions and removals are sent to Maya.
+    """
+    added, removed, updates = [], [], []
+    for dagpath, comptype, region in regions:
+        current = get_bitset(dagpath, comptype)
+        added.extend(component_strings(dagpath, comptype, (region - current).ranges()))
+        removed.extend(component_strings(dagpath, comptype, (region & current).ranges()))
+        key = (get_dagpath(dagpath).fullPathName(), comptype)
+        updates.append((key, current ^ region))
+
+    _apply(added, removed, updates)
+
+
+def extend(regions):
+    """
+    Add regions in a single selection commit.
+
+    ``regions`` is an iterable of ``(dagpath, comptype, Bitset)``.
+    """
+    added, updates = [], []
+    for dagpath, comptype, region in regions:
+        current = get_bitset(dagpath, comptype)
+        added.extend(component_strings(dagpath, comptype, (region - current).ranges()))
+        key = (get_dagpath(dagpath).fullPathName(), comptype)
+        updates.append((key, current | region))
+    _apply(added, [], updates)
+
+
+def replace(regions):
+    """
+    Make regions the active selection by committing only the difference.
+
+    ``regions`` is an iterable of ``(dagpath, comptype, Bitset)``, regions of
+    the same mesh and component type are merged. Anything selected outside
+    of regions is deselected, so the result matches ``cmds.select(regions)``
+    while the undo queue only holds what actually changed.
+    """
+    merged = collections.OrderedDict()
+    for dagpath, comptype, region in regions:
+        key = (get_dagpath(dagpath).fullPathName(), comptype)
+        merged[key] = merged[key] | region if key in merged else region
+
+    mirror = get_mirror()
+    added, removed, updates = [], list(OTHER), []
+    for key in mirror.keys():
+        if key not in merged:
+            removed.extend(component_strings(key[0], key[1], mirror[key].ranges()))
+            updates.append((key, None))
+
+    for (name, comptype), region in merged.iteritems():
+        current = get_bitset(name, comptype)
+        added.extend(component_strings(name, comptype, (region - current).ranges()))
+        removed.extend(component_strings(name, comptype, (current - region).ranges()))
+        updates.append(((name, comptype), region))
+
+    _apply(added, removed, updates)
+    del OTHER[:]
+
+
+def from_complist(complist):
+    """Yield ``(dagpath, comptype, Bitset)`` regions of mampy components."""
+    for comp in complist:
+        count = get_component_count(comp.dagpath, comp.type)
+        yield comp.dagpath, comp.type, Bitset.from_indices(comp.indices, count)
+
+
+def _apply(added, removed, updates):
+    with suppressed():
+        if removed:
+            cmds.select(removed, deselect=True)
+        if added:
+            cmds.select(added, add=True)
+
+    for key, bitset in updates:
+        if bitset is None:
+            MIRROR.pop(key, None)
+        else:
+            MIRROR[key] = bitset
+
+
+def clear():
+    """Clear active selection and mirror."""
+    global STALE
+    with suppressed():
+        cmds.select(clear=True)
+    MIRROR.clear()
+    del OTHER[:]
+    STALE = False
+
+
+def chunked(indices, size=CHUNK_SIZE):
+    """Yield indices as int arrays of at most size items."""
+    indices = iter(indices)
+    while True:
+        chunk = int_array(itertools.islice(indices, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextlib.contextmanager
+def progress(total=None, title='mamselect', threshold=PROGRESS_THRESHOLD):
+    """
+    Yield ``step(count)`` reporting committed components to a progress window.
+
+    The window only opens once more than threshold components were reported,
+    so small commits never flash it. ``step`` returns False once the user
+    cancelled. No window is shown in batch mode.
+    """
+    if cmds.about(batch=True) or (total is not None and total <= threshold):
+        yield lambda count: True
+        return
+
+    done, opened = [0], [False]
+
+    def step(count):
+        done[0] += count
+        if not opened[0]:
+            if done[0] <= threshold:
+                return True
+            cmds.progressWindow(title=title, progress=0, maxValue=100,
+                                isInterruptable=True)
+            opened[0] = True
+        kwargs = {'status': '{} components'.format(done[0])}
+        if total:
+            kwargs['progress'] = min(100, 100 * done[0] // total)
+        cmds.progressWindow(edit=True, **kwargs)
+        return not cmds.progressWindow(query=True, isCancelled=True)
+
+    try:
+        yield step
+    finally:
+        if opened[0]:
+            cmds.progressWindow(endProgress=True)
+
+
+def _commit_batch(batch, deselect):
+    adjustment = api.MGlobal.kRemoveFromList if deselect else api.MGlobal.kAddToList
+    with suppressed():
+        api.MGlobal.selectCommand(batch, adjustment)
+    batch.clear()
+
+
+def stream(chunks, deselect=False, total=None):
+    """
+    Add or remove ``(dagpath, comptype, indices)`` chunks in bounded batches.
+
+    Chunks are gathered into a MSelectionList that is committed every
+    ``BATCH_SIZE`` components, so neither index lists nor component strings
+    of the whole result exist at once. Progress and cancellation are checked
+    between chunks; returns number of components committed.
+    """
+    batch, pending, committed, touched = api.MSelectionList(), 0, 0, set()
+    with progress(total) as step:
+        for dagpath, comptype, indices in chunks:
+            dagpath = get_dagpath(dagpath)
+            fn = api.MFnSingleIndexedComponent()
+            component = fn.create(comptype)
+            fn.addElements(list(indices))
+            batch.add((dagpath, component))
+            pending += len(indices)
+
+            if not STALE:
+                key = (dagpath.fullPathName(), comptype)
+                if key not in touched:
+                    touched.add(key)
+                    MIRROR[key] = (MIRROR[key].copy() if key in MIRROR else
+                                   Bitset(get_component_count(dagpath, comptype)))
+                if deselect:
+                    MIRROR[key].difference_update(indices)
+                else:
+                    MIRROR[key].update(indices)
+
+            if pending >= BATCH_SIZE:
+                _commit_batch(batch, deselect)
+                committed, pending = committed + pending, 0
+            if not step(len(indices)):
+                logger.info('Selection cancelled after {} components.'.format(
+                    committed + pending))
+                break
+
+        if pending:
+            _commit_batch(batch, deselect)
+            committed += pending
+    return committed
+
+
+class Snapshot(object):
+    """
+    Compact, hashable copy of a component selection.
+
+    Indices are stored as inclusive ranges per mesh and component type, each
+    with its own hash so comparing snapshots rarely has to look at the ranges.
+    """
+
+    __slots__ = ('ranges', 'hashes', 'digest')
+
+    def __init__(self, ranges):
+        self.ranges = ranges
+        self.hashes = dict((key, hash(value)) for key, value in ranges.iteritems())
+        self.digest = hash(frozenset(self.hashes.iteritems()))
+
+    def __repr__(self):
+        return '{}({} meshes, {} components)'.format(
+            self.__class__.__name__, len(self.ranges), len(self))
+
+    def __len__(self):
+        return sum(
+            end - start + 1 for value in self.ranges.itervalues()
+            for start, end in value
+        )
+
+    def __hash__(self):
+        return self.digest
+
+    def __eq__(self, other):
+        return (isinstance(other, Snapshot) and self.digest == other.digest and
+                self.hashes == other.hashes and self.ranges == other.ranges)
+
+    def __ne__(self, other):
+        return not self == other
+
+    @classmethod
+    def from_bitsets(cls, bitsets):
+        return cls(dict(
+            (key, tuple(bitset.ranges())) for key, bitset in bitsets.iteritems()
+            if bitset
+        ))
+
+    @classmethod
+    def from_active(cls):
+        """Return snapshot of the active selection."""
+        refresh()
+        return cls.from_bitsets(MIRROR)
+
+    def bitsets(self):
+        result = {}
+        for (name, comptype), ranges in self.ranges.iteritems():
+            bitset = Bitset(get_component_count(name, comptype))
+            for start, end in ranges:
+                bitset.add_range(start, end)
+            result[name, comptype] = bitset
+        return result
+
+    def regions(self):
+        """Return snapshot as ``(name, comptype, Bitset)`` regions."""
+        return [(name, comptype, bitset)
+                for (name, comptype), bitset in self.bitsets().iteritems()]
+
+    def cmdslist(self):
+        return [
+            string for (name, comptype), ranges in self.ranges.iteritems()
+            for string in component_strings(name, comptype, ranges)
+        ]
+
+
+class SelectionHistory(object):
+    """
+    Bounded ring buffer of :class:`Snapshot`.
+
+    Pushing the snapshot already on top is a no-op. :meth:`back` and
+    :meth:`forward` move a cursor through the history without dropping
+    anything, the next push discards what is ahead of the cursor.
+    """
+
+    def __init__(self, maxlen=32):
+        self._snapshots = collections.deque(maxlen=maxlen)
+        self._cursor = 0
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def __getitem__(self, index):
+        return self._snapshots[index]
+
+    def __iter__(self):
+        return iter(self._snapshots)
+
+    @property
+    def current(self):
+        if not self._snapshots:
+            return None
+        return self._snapshots[-1 - self._cursor]
+
+    def clear(self):
+        self._snapshots.clear()
+        self._cursor = 0
+
+    def is_repeat(self, snapshot):
+        """Return True if snapshot matches the most recent entry."""
+        return bool(self._snapshots) and self._snapshots[-1] == snapshot
+
+    def push(self, snapshot):
+        for _ in xrange(self._cursor):
+            self._snapshots.pop()
+        self._cursor = 0
+        if self.is_repeat(snapshot):
+            return False
+        self._snapshots.append(snapshot)
+        return True
+
+    def back(self, steps=1):
+        self._cursor = min(self._cursor + steps, len(self._snapshots) - 1)
+        return self.current
+
+    def forward(self, steps=1):
+        self._cursor = max(self._cursor - steps, 0)
+        return self.current
@@ -0,0 +1,254 @@
+"""
+Named selections stored as compressed per mesh bitsets.
+
+Each mesh of a named selection is kept as a zlib compressed :class:`Bitset`
+keyed by mesh path. The topology hash of the mesh is stored alongside, so a
+stored selection finds its mesh again after renames or reopening the scene.
+Set algebra works on the bitsets directly and recall goes through
+:func:`selection.replace`, committing only the range compressed difference to
+the current selection.
+
+Named selections can be persisted as json files in ``SNAPSHOT_DIR``, set with
+the ``MAMSELECT_SNAPSHOT_DIR`` environment variable.
+
+Usage:
+
+    store('panel_faces', persist=True)
+    recall(union('both_panels', 'panel_faces', 'other_panel'))
+
+"""
+import os
+import json
+import zlib
+import base64
+import logging
+import collections
+
+from maya import cmds
+
+from mamselect import selection, topology
+from mamselect.bitset import Bitset
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_DIR = os.environ.get(
+    'MAMSELECT_SNAPSHOT_DIR',
+    os.path.join(os.path.expanduser('~'), '.mamselect', 'snapshots')
+)
+
+STORE = collections.OrderedDict()
+
+
+class MeshBits(object):
+    """Compressed selection of one component type on one mesh."""
+
+    __slots__ = ('key', 'size', 'data')
+
+    def __init__(self, key, size, data):
+        self.key = key
+        self.size = size
+        self.data = data
+
+    @classmethod
+    def from_bitset(cls, key, bitset):
+        return cls(key, bitset.size, zlib.compress(bytes(bitset.data)))
+
+    def bitset(self):
+        return Bitset(self.size, bytearray(zlib.decompress(self.data)))
+
+
+class NamedSelection(object):
+    """
+    Selection of several meshes keyed by ``(mesh path, comptype)``.
+
+    ``|``, ``&`` and ``-`` combine selections mesh by mesh on their bitsets.
+    """
+
+    __slots__ = ('name', 'meshes')
+
+    def __init__(self, name, meshes=None):
+        self.name = name
+        self.meshes = meshes if meshes is not None else collections.OrderedDict()
+
+    def __repr__(self):
+        return '{}({!r}, {} meshes)'.format(
+            self.__class__.__name__, self.name, len(self.meshes))
+
+    def __len__(self):
+        return len(self.meshes)
+
+    def __or__(self, other):
+        return self._combine(other, lambda a, b: a | b, keep=True)
+
+    def __and__(self, other):
+        return self._combine(other, lambda a, b: a & b, keep=False)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a - b, keep=True, right=False)
+
+    def _combine(self, other, operation, keep, right=True):
+        """
+        Return new selection from operation on shared keys.
+
+        Keys only in self are kept if keep, keys only in other too if right.
+        """
+        meshes = collections.OrderedDict()
+        keys = list(self.meshes) + [k for k in other.meshes if k not in self.meshes]
+        for key in keys:
+            first, second = self.meshes.get(key), other.meshes.get(key)
+            if first is not None and second is not None:
+                bitset = operation(first.bitset(), second.bitset())
+                if bitset:
+                    meshes[key] = MeshBits.from_bitset(first.key, bitset)
+            elif keep and first is not None:
+                meshes[key] = first
+            elif keep and right and second is not None:
+                meshes[key] = second
+        return self.__class__(None, meshes)
+
+    @classmethod
+    def from_active(cls, name):
+        """Return named selection of the active component selection."""
+        selection.refresh()
+        meshes = collections.OrderedDict()
+        for (path, comptype), bitset in selection.get_mirror().iteritems():
+            if not bitset:
+                continue
+            key = topology.get_topology(path).key
+            meshes[path, comptype] = MeshBits.from_bitset(key, bitset)
+        return cls(name, meshes)
+
+    def regions(self):
+        """
+        Return ``(dagpath, comptype, Bitset)`` regions in the current scene.
+
+        Meshes are looked up by stored path first. Meshes whose path is gone
+        or whose topology no longer matches are relinked to a scene mesh with
+        the same topology hash, each scene mesh taken at most once per
+        component type so duplicated meshes keep their own selection.
+        """
+        found, missing, linked = [], [], set()
+        for (path, comptype), bits in self.meshes.iteritems():
+            if cmds.objExists(path) and topology.get_topology(path).key == bits.key:
+                found.append((path, comptype, bits.bitset()))
+                linked.add((path, comptype))
+            else:
+                missing.append((path, comptype, bits))
+        if not missing:
+            return found
+
+        lookup = collections.defaultdict(list)
+        for mesh in cmds.ls(type='mesh', noIntermediate=True, long=True) or []:
+            lookup[topology.get_topology(mesh).key].append(mesh)
+
+        for path, comptype, bits in missing:
+            for mesh in lookup[bits.key]:
+                if (mesh, comptype) not in linked:
+                    linked.add((mesh, comptype))
+                    found.append((mesh, comptype, bits.bitset()))
+                    break
+            else:
+                logger.warn('No mesh matching {} in scene.'.format(path))
+        return found
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'meshes': [
+                [path, comptype, bits.key, bits.size, base64.b64encode(bits.data)]
+                for (path, comptype), bits in self.meshes.iteritems()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        meshes = collections.OrderedDict()
+        for path, comptype, key, size, encoded in data['meshes']:
+            meshes[path, comptype] = MeshBits(key, size, base64.b64decode(encoded))
+        return cls(data['name'], meshes)
+
+
+def get_path(name):
+    return os.path.join(SNAPSHOT_DIR, name + '.json')
+
+
+def save(snapshot):
+    """Write named selection to ``SNAPSHOT_DIR``."""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        os.makedirs(SNAPSHOT_DIR)
+    with open(get_path(snapshot.name), 'w') as f:
+        json.dump(snapshot.to_dict(), f)
+
+
+def load(name):
+    """Return named selection from memory, or from disk if persisted."""
+    if name not in STORE:
+        try:
+            with open(get_path(name)) as f:
+                STORE[name] = NamedSelection.from_dict(json.load(f))
+        except (IOError, OSError):
+            raise KeyError('No selection named {}.'.format(name))
+    return STORE[name]
+
+
+def names():
+    """Return names of stored and persisted selections."""
+    result = list(STORE)
+    if os.path.isdir(SNAPSHOT_DIR):
+        result.extend(
+            os.path.splitext(n)[0] for n in sorted(os.listdir(SNAPSHOT_DIR))
+            if n.endswith('.json') and os.path.splitext(n)[0] not in STORE
+        )
+    return result
+
+
+def store(name, persist=False):
+    """Store active selection under name."""
+    snapshot = STORE[name] = NamedSelection.from_active(name)
+    if persist:
+        save(snapshot)
+    return snapshot
+
+
+def remove(name):
+    STORE.pop(name, None)
+    try:
+        os.remove(get_path(name))
+    except OSError:
+        pass
+
+
+def _combine(name, first, others, operation, persist):
+    result = NamedSelection(name, collections.OrderedDict(load(first).meshes))
+    for other in others:
+        result = operation(result, load(other))
+    result.name = name
+    STORE[name] = result
+    if persist:
+        save(result)
+    return name
+
+
+def union(name, first, *others, **kwargs):
+    """Store union of named selections as name, return name."""
+    return _combine(name, first, others, lambda a, b: a | b, kwargs.get('persist'))
+
+
+def intersect(name, first, *others, **kwargs):
+    """Store intersection of named selections as name, return name."""
+    return _combine(name, first, others, lambda a, b: a & b, kwargs.get('persist'))
+
+
+def subtract(name, first, *others, **kwargs):
+    """Store first minus the other named selections as name, return name."""
+    return _combine(name, first, others, lambda a, b: a - b, kwargs.get('persist'))
+
+
+def recall(name, add=False):
+    """Select named selection, committing only the difference."""
+    regions = load(name).regions()
+    if add:
+        selection.extend(regions)
+    else:
+        selection.replace(regions)
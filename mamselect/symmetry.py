@@ -0,0 +1,265 @@
+"""
+Per mesh mirror maps for symmetric selection.
+
+Vertices are paired with their mirror image through a k-d tree on object space
+positions, vertices left without a match are paired by walking out from
+matched neighbours. Edges, faces and uvs follow from the vertex pairs. Maps
+are cached per mesh until topology or points change, so mirroring a result is
+one gather through an index array.
+
+Tools mirror their own result once before committing it, when called with
+``mirror=True``, across :data:`AXIS` which defaults to x. Setting the axis to
+None turns mirroring off for every tool. The commit layer in :mod:`selection`
+never mirrors, so history and named selections are restored exactly.
+
+Usage:
+
+    set_axis('x')
+    selection.extend(mirrored(regions))
+    selection.toggle(mirrored_toggle(regions))
+
+"""
+import logging
+
+from maya.api.OpenMaya import MFn
+
+from mamselect import selection, topology
+from mamselect.bitset import Bitset
+
+logger = logging.getLogger(__name__)
+
+
+AXES = {'x': 0, 'y': 1, 'z': 2}
+
+# Distance a mirrored vertex may lie from its match.
+TOLERANCE = 0.001
+
+# Axis mirrored tool results are mirrored across unless given one, None
+# leaves them unmirrored.
+AXIS = 'x'
+
+_cache = {}
+
+
+def set_axis(axis):
+    """Set object space axis tool results are mirrored across, None for off."""
+    global AXIS
+    if axis is not None and axis not in AXES:
+        raise ValueError('Axis needs to be one of x, y, z or None.')
+    AXIS = axis
+
+
+class KDTree(object):
+    """Balanced k-d tree over a flat array of points, three floats each."""
+
+    __slots__ = ('points', 'order')
+
+    def __init__(self, points):
+        self.points = points
+        self.order = topology.int_array(xrange(len(points) // 3))
+
+        stack = [(0, len(self.order), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi - lo < 2:
+                continue
+            self.order[lo:hi] = topology.int_array(sorted(
+                self.order[lo:hi], key=lambda i: points[i * 3 + axis]))
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, (axis + 1) % 3))
+            stack.append((mid + 1, hi, (axis + 1) % 3))
+
+    def __len__(self):
+        return len(self.order)
+
+    def nearest(self, point, radius=float('inf')):
+        """Return index of closest point within radius, or -1."""
+        points, order = self.points, self.order
+        best, best_distance = -1, radius * radius
+        stack = [(0, len(order), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            index = order[mid]
+            i = index * 3
+            dx = point[0] - points[i]
+            dy = point[1] - points[i + 1]
+            dz = point[2] - points[i + 2]
+            distance = dx * dx + dy * dy + dz * dz
+            if distance <= best_distance:
+                best, best_distance = index, distance
+
+            diff = point[axis] - points[i + axis]
+            near, far = (lo, mid), (mid + 1, hi)
+            if diff > 0:
+                near, far = far, near
+            if diff * diff <= best_distance:
+                stack.append((far[0], far[1], (axis + 1) % 3))
+            stack.append((near[0], near[1], (axis + 1) % 3))
+        return best
+
+
+def match_topology(topo, verts):
+    """
+    Pair unmatched vertices through their matched neighbours.
+
+    A vertex is paired with the one unmatched vertex linked to the mirror of
+    all its matched neighbours. Repeats until nothing more can be paired.
+    """
+    links = topo.vert_links
+    changed = True
+    while changed:
+        changed = False
+        for vert in xrange(len(verts)):
+            if not verts[vert] == -1:
+                continue
+            mirrored = [verts[n] for n in links[vert] if not verts[n] == -1]
+            if not mirrored:
+                continue
+            candidates = set(links[mirrored[0]])
+            for other in mirrored[1:]:
+                candidates.intersection_update(links[other])
+            candidates = [c for c in candidates if verts[c] == -1 or c == vert]
+            if len(candidates) == 1:
+                verts[vert] = candidates[0]
+                verts[candidates[0]] = vert
+                changed = True
+    return verts
+
+
+class MirrorMap(object):
+    """Mirror index of each vert, edge, face and uv of a mesh, -1 if none."""
+
+    __slots__ = ('verts', 'edges', 'faces', 'uvs')
+
+    def __init__(self, topo, axis, points, tolerance=TOLERANCE):
+        tree = KDTree(points)
+        verts = topology.int_array([-1]) * topo.num_verts
+        for vert in xrange(topo.num_verts):
+            point = list(points[vert * 3:vert * 3 + 3])
+            point[axis] = -point[axis]
+            verts[vert] = tree.nearest(point, tolerance)
+        self.verts = match_topology(topo, verts)
+
+        self.edges = topology.int_array(
+            -1 if -1 in (verts[v1], verts[v2]) else topo.find_edge(verts[v1], verts[v2])
+            for v1, v2 in topo.edge_verts
+        )
+
+        vert_faces = topo.vert_faces
+        self.faces = topology.int_array([-1]) * topo.num_faces
+        for face, row in enumerate(topo.face_verts):
+            mirrored = [verts[v] for v in row]
+            if -1 in mirrored:
+                continue
+            candidates = set(vert_faces[mirrored[0]])
+            for vert in mirrored[1:]:
+                candidates.intersection_update(vert_faces[vert])
+            if len(candidates) == 1:
+                self.faces[face] = candidates.pop()
+
+        self.uvs = None
+        if topo.dagpath is not None:
+            self.uvs = self._get_uvs(topo, topo.uv)
+
+    def _get_uvs(self, topo, uv):
+        # Uvs pair up at the same corner of mirrored faces.
+        uvs = topology.int_array([-1]) * uv.num_uvs
+        for face, row in enumerate(topo.face_verts):
+            other, face_uvs = self.faces[face], uv.face_uvs[face]
+            if other == -1 or not len(face_uvs) == len(row):
+                continue
+            other_verts, other_uvs = topo.face_verts[other], uv.face_uvs[other]
+            if not len(other_uvs) == len(other_verts):
+                continue
+            for i, vert in enumerate(row):
+                uvs[face_uvs[i]] = other_uvs[other_verts.index(self.verts[vert])]
+        return uvs
+
+    def __getitem__(self, comptype):
+        return {
+            MFn.kMeshVertComponent: self.verts,
+            MFn.kMeshEdgeComponent: self.edges,
+            MFn.kMeshPolygonComponent: self.faces,
+            MFn.kMeshMapComponent: self.uvs,
+        }[comptype]
+
+    def mirror(self, comptype, indices):
+        """Return mirrored indices of component type, skipping unmatched."""
+        table = self[comptype]
+        if table is None:
+            return []
+        return [table[i] for i in indices if not table[i] == -1]
+
+
+def get_mirror_map(dagpath, axis='x'):
+    """Return :class:`MirrorMap` of mesh across axis."""
+    topo = topology.get_topology(dagpath)
+    points = topo.points()
+    key = (topo.name, axis)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] is topo.edge_verts and cached[1] == points:
+        return cached[2]
+
+    mirror_map = MirrorMap(topo, AXES[axis], points)
+    _cache[key] = (topo.edge_verts, points, mirror_map)
+    logger.debug('Built {} mirror map of {}'.format(axis, topo))
+    return mirror_map
+
+
+def mirror_indices(dagpath, comptype, indices, axis=None):
+    """Return indices joined with their mirror image across axis or :data:`AXIS`."""
+    indices = topology.int_array(indices)
+    axis = axis or AXIS
+    if axis is not None:
+        indices.extend(get_mirror_map(dagpath, axis).mirror(comptype, indices))
+    return indices
+
+
+def mirrored(regions, axis=None):
+    """
+    Yield regions joined with their mirror image across axis or :data:`AXIS`.
+
+    ``regions`` is an iterable of ``(dagpath, comptype, Bitset)``.
+    """
+    axis = axis or AXIS
+    for dagpath, comptype, region in regions:
+        if axis is None:
+            yield dagpath, comptype, region
+            continue
+        mirror = get_mirror_map(dagpath, axis).mirror(comptype, region)
+        yield dagpath, comptype, region | Bitset.from_indices(mirror, region.size)
+
+
+def mirrored_toggle(regions, axis=None):
+    """
+    Yield toggle regions that take the mirror side along with the root side.
+
+    A mirror component is only toggled when its state matches that of its root
+    component, so after the toggle it is in the state its root was toggled to
+    instead of flipping on its own.
+    """
+    axis = axis or AXIS
+    for dagpath, comptype, region in regions:
+        table = None if axis is None else get_mirror_map(dagpath, axis)[comptype]
+        if table is None:
+            yield dagpath, comptype, region
+            continue
+
+        current = selection.get_bitset(dagpath, comptype)
+        following = Bitset(region.size)
+        for index in region:
+            other = table[index]
+            if other == -1 or other in region:
+                continue
+            if (other in current) == (index in current):
+                following.add(other)
+        yield dagpath, comptype, region | following
+
+
+def mirrored_chunks(chunks, axis=None):
+    """Yield ``(dagpath, comptype, indices)`` chunks joined with their mirror image."""
+    for dagpath, comptype, indices in chunks:
+        yield dagpath, comptype, mirror_indices(dagpath, comptype, indices, axis)
@@ -0,0 +1,1465 @@
+"""
+Cached mesh topology stored as flat compressed row (CSR) arrays.
+
+Walking topology through component conversion means a round trip to Maya for
+every query. Here the connectivity of a mesh is read once into typed arrays and
+kept around until the mesh changes. Local edits such as extrudes or splits are
+patched into the existing arrays; only edits touching more than
+``REBUILD_FRACTION`` of the faces trigger a full rebuild.
+
+Usage:
+
+    topo = get_topology(comp.dagpath)
+    topo.adjacent(MFn.kMeshPolygonComponent, comp.indices)
+
+"""
+import math
+import array
+import bisect
+import logging
+
+import maya.api.OpenMaya as api
+from maya.api.OpenMaya import MFn
+
+from mamselect import diskcache
+from mamselect.bitset import Bitset
+
+logger = logging.getLogger(__name__)
+
+
+# Fraction of faces an edit may touch before patching is abandoned in favour of
+# a full rebuild.
+REBUILD_FRACTION = 0.25
+
+# Number of rows compared at once when looking for changed faces.
+BLOCK_SIZE = 4096
+
+# Distance a face center may lie off the plane of its planar patch.
+PLANE_TOLERANCE = 0.001
+
+# Mesh attributes, by name prefix, whose dirtying can reassign uvs.
+UV_ATTRIBUTES = ('inMesh', 'uv', 'polyFaces', 'currentUVSet')
+# Mesh attributes, by name prefix, whose dirtying can move vertices.
+POINT_ATTRIBUTES = ('inMesh', 'pnts', 'vrts')
+
+# Attribute holding the incidence table for each (source, target) conversion.
+CONVERSION_TABLES = {
+    (MFn.kMeshPolygonComponent, MFn.kMeshVertComponent): 'face_verts',
+    (MFn.kMeshPolygonComponent, MFn.kMeshEdgeComponent): 'face_edges',
+    (MFn.kMeshPolygonComponent, MFn.kMeshMapComponent): 'face_uvs',
+    (MFn.kMeshEdgeComponent, MFn.kMeshVertComponent): 'edge_verts',
+    (MFn.kMeshEdgeComponent, MFn.kMeshPolygonComponent): 'edge_faces',
+    (MFn.kMeshVertComponent, MFn.kMeshEdgeComponent): 'vert_edges',
+    (MFn.kMeshVertComponent, MFn.kMeshPolygonComponent): 'vert_faces',
+    (MFn.kMeshVertComponent, MFn.kMeshMapComponent): 'vert_uvs',
+    (MFn.kMeshEdgeComponent, MFn.kMeshMapComponent): 'edge_uvs',
+    (MFn.kMeshMapComponent, MFn.kMeshVertComponent): 'uv_verts',
+    (MFn.kMeshMapComponent, MFn.kMeshEdgeComponent): 'uv_edges',
+    (MFn.kMeshMapComponent, MFn.kMeshPolygonComponent): 'uv_faces',
+}
+
+
+def int_array(iterable=()):
+    return array.array('i', iterable)
+
+
+def get_dagpath(obj):
+    """Return mesh shape :class:`api.MDagPath` from dagpath, node or name."""
+    if isinstance(obj, api.MDagPath):
+        dagpath = api.MDagPath(obj)
+    else:
+        sel = api.MSelectionList()
+        sel.add(str(obj))
+        dagpath = sel.getDagPath(0)
+
+    if not dagpath.apiType() == MFn.kMesh:
+        dagpath.extendToShape()
+    return dagpath
+
+
+def get_meshes(objects):
+    """Return unique mesh shape dagpaths from given objects, skipping others."""
+    meshes, seen = [], set()
+    for obj in objects:
+        try:
+            dagpath = get_dagpath(obj)
+        except RuntimeError:
+            continue
+        if not dagpath.apiType() == MFn.kMesh:
+            continue
+        if dagpath.fullPathName() in seen:
+            continue
+        seen.add(dagpath.fullPathName())
+        meshes.append(dagpath)
+    return meshes
+
+
+class CSR(object):
+    """
+    Rows of integers packed into an offsets and a values array.
+
+    Row ``i`` is ``values[offsets[i]:offsets[i + 1]]``.
+    """
+
+    __slots__ = ('offsets', 'values')
+
+    def __init__(self, offsets=None, values=None):
+        self.offsets = int_array([0]) if offsets is None else offsets
+        self.values = int_array() if values is None else values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+    def __iter__(self):
+        for row in xrange(len(self)):
+            yield self[row]
+
+    @classmethod
+    def from_counts(cls, counts, values):
+        offsets, total = int_array([0]), 0
+        for count in counts:
+            total += count
+            offsets.append(total)
+        return cls(offsets, int_array(values))
+
+    @classmethod
+    def from_rows(cls, rows):
+        csr = cls()
+        for row in rows:
+            csr.values.extend(row)
+            csr.offsets.append(len(csr.values))
+        return csr
+
+    def counts(self, start=0, end=None):
+        offsets = self.offsets
+        end = len(self) if end is None else end
+        return int_array(offsets[i + 1] - offsets[i] for i in xrange(start, end))
+
+    def gather(self, rows):
+        """Return set of all values found in given rows."""
+        result = set()
+        for row in rows:
+            result.update(self[row])
+        return result
+
+    def gather_bits(self, rows, size):
+        """Return :class:`Bitset` of all values found in given rows."""
+        result = Bitset(size)
+        offsets, values = self.offsets, self.values
+        for row in rows:
+            result.update(values[offsets[row]:offsets[row + 1]])
+        return result
+
+    def transpose(self, size):
+        """Return inverse table, mapping each value to the rows containing it."""
+        counts = int_array([0]) * size
+        for value in self.values:
+            counts[value] += 1
+
+        offsets = CSR.from_counts(counts, ()).offsets
+        fill = offsets[:-1]
+        values = int_array([0]) * len(self.values)
+        for row in xrange(len(self)):
+            for k in xrange(self.offsets[row], self.offsets[row + 1]):
+                col = self.values[k]
+                values[fill[col]] = row
+                fill[col] += 1
+        return CSR(offsets, values)
+
+    def splice(self, rows, size=None):
+        """
+        Return new table with given rows replaced.
+
+        ``rows`` maps row index to its new values, indices past the end are
+        appended. Rows in between are padded empty up to ``size``.
+        """
+        size = max(len(self), size or 0, max(rows) + 1 if rows else 0)
+        offsets, values = int_array([0]), int_array()
+
+        def copy(start, end):
+            end = min(end, len(self))
+            if start >= end:
+                return
+            lo, hi = self.offsets[start], self.offsets[end]
+            shift = len(values) - lo
+            values.extend(self.values[lo:hi])
+            offsets.extend(o + shift for o in self.offsets[start + 1:end + 1])
+
+        start = 0
+        for row in sorted(rows):
+            copy(start, row)
+            for _ in xrange(max(start, len(self)), row):
+                offsets.append(len(values))
+            values.extend(rows[row])
+            offsets.append(len(values))
+            start = row + 1
+
+        copy(start, len(self))
+        for _ in xrange(max(start, len(self)), size):
+            offsets.append(len(values))
+        return CSR(offsets, values)
+
+
+def changed_rows(old, new):
+    """Return rows that differ between two tables, compared in blocks."""
+    changed = []
+    for start in xrange(0, len(new), BLOCK_SIZE):
+        end = min(start + BLOCK_SIZE, len(new))
+        if end <= len(old):
+            old_block = old.values[old.offsets[start]:old.offsets[end]]
+            new_block = new.values[new.offsets[start]:new.offsets[end]]
+            if (old_block == new_block and
+                    old.counts(start, end) == new.counts(start, end)):
+                continue
+        for row in xrange(start, end):
+            if row >= len(old) or not old[row] == new[row]:
+                changed.append(row)
+    return changed
+
+
+def patch_inverse(inverse, changed, before, after, size):
+    """
+    Splice rows of an inverse table for rows that changed in the forward table.
+
+    ``before`` and ``after`` are the forward tables on each side of the edit.
+    """
+    changed_set = set(changed)
+    touched = {}
+    for row in changed:
+        if row < len(before):
+            for col in before[row]:
+                touched.setdefault(col, set())
+        for col in after[row]:
+            touched.setdefault(col, set()).add(row)
+
+    rows = {}
+    for col, added in touched.iteritems():
+        kept = [] if col >= len(inverse) else [
+            r for r in inverse[col] if r not in changed_set
+        ]
+        rows[col] = sorted(kept + list(added))
+    return inverse.splice(rows, size)
+
+
+def label_components(links, mask=None):
+    """
+    Return connected component label for each row of a neighbour table.
+
+    With a mask, links are only followed between rows on the same side of it,
+    labelling the regions inside and outside the mask in the same pass.
+    """
+    labels = int_array([-1]) * len(links)
+    label = 0
+    for start in xrange(len(links)):
+        if not labels[start] == -1:
+            continue
+        labels[start] = label
+        stack = [start]
+        inside = mask is not None and start in mask
+        while stack:
+            for other in links[stack.pop()]:
+                if labels[other] == -1 and (mask is None or (other in mask) == inside):
+                    labels[other] = label
+                    stack.append(other)
+        label += 1
+    return labels
+
+
+def shortest_path(links, start, end):
+    """Return elements on the shortest path between start and end, or []."""
+    previous = {start: None}
+    frontier = [start]
+    while frontier and end not in previous:
+        next_frontier = []
+        for current in frontier:
+            for other in links[current]:
+                if other not in previous:
+                    previous[other] = current
+                    next_frontier.append(other)
+        frontier = next_frontier
+
+    if end not in previous:
+        return []
+    path = [end]
+    while previous[path[-1]] is not None:
+        path.append(previous[path[-1]])
+    path.reverse()
+    return path
+
+
+def trace_loop(links, element_faces, face_elements, first, second):
+    """
+    Return ordered loop through two linked elements and whether it is closed.
+
+    The loop continues through the single link that shares no face with the one
+    it came from. That walks straight across regular elements and along
+    borders, and stops at poles, corners or when the loop closes.
+    """
+    def step(previous, current):
+        neighbours = links[current]
+        sides = set()
+        for face in element_faces[current]:
+            elements = face_elements[face]
+            if previous in elements:
+                sides.update(elements)
+        candidates = set(neighbours) - sides - set([previous])
+        return candidates.pop() if len(candidates) == 1 else None
+
+    def walk(previous, current, seen):
+        walked = []
+        while True:
+            following = step(previous, current)
+            if following is None or following in seen:
+                return walked, following
+            walked.append(following)
+            seen.add(following)
+            previous, current = current, following
+
+    seen = set([first, second])
+    forward, stop = walk(first, second, seen)
+    if stop == first:
+        return [first, second] + forward, True
+
+    backward, _ = walk(second, first, seen)
+    backward.reverse()
+    return backward + [first, second] + forward, False
+
+
+def walk_loop(links, element_faces, face_elements, first, second):
+    """Return ordered loop through two linked elements."""
+    return trace_loop(links, element_faces, face_elements, first, second)[0]
+
+
+class LoopIndex(object):
+    """
+    All loops of one component type with a lookup of element to loops.
+
+    ``loops`` holds each loop in order, ``element_loops`` the loops every
+    element takes part in and ``closed`` a flag per loop.
+    """
+
+    def __init__(self, loops, closed, size):
+        self.loops = CSR.from_rows(loops)
+        self.closed = array.array('b', closed)
+        self.element_loops = self.loops.transpose(size)
+
+    def __len__(self):
+        return len(self.loops)
+
+    def shared(self, first, second):
+        """Return ids of loops containing both elements."""
+        return [
+            loop for loop in self.element_loops[first]
+            if second in self.loops[loop]
+        ]
+
+    def distance(self, loop, first, second):
+        """Return steps along loop between two of its elements."""
+        row = self.loops[loop]
+        steps = abs(row.index(first) - row.index(second))
+        if self.closed[loop]:
+            steps = min(steps, len(row) - steps)
+        return steps
+
+    def every_nth(self, loop, start, stride):
+        """Return every stride:th element of loop, counted from start."""
+        row = self.loops[loop]
+        if stride < 1:
+            return [start]
+        position, count = row.index(start), len(row)
+        if self.closed[loop]:
+            return [row[(position + i * stride) % count] for i in xrange(count // stride)]
+        return list(row[position % stride::stride])
+
+
+class PatchIndex(object):
+    """
+    Partition of faces into planar patches.
+
+    ``labels`` holds the patch id of every face, ``patches`` the faces of
+    every patch and ``normals`` the plane normal of each patch, three floats
+    per patch. ``links`` is built on first use from vert_faces.
+    """
+
+    def __init__(self, labels, normals, vert_faces=None):
+        self.labels = labels
+        self.normals = normals
+        self.patches = CSR.from_rows([label] for label in labels).transpose(
+            len(normals) // 3)
+        self._vert_faces = vert_faces
+        self._links = None
+
+    def __len__(self):
+        return len(self.patches)
+
+    @property
+    def links(self):
+        """Return neighbour table of patches, linked when their faces share a vert."""
+        if self._links is None:
+            labels = self.labels
+            rows = [set() for _ in xrange(len(self))]
+            for faces in self._vert_faces:
+                around = set(labels[f] for f in faces)
+                if len(around) < 2:
+                    continue
+                for label in around:
+                    rows[label].update(around)
+            for label, row in enumerate(rows):
+                row.discard(label)
+            self._links = CSR.from_rows(sorted(row) for row in rows)
+        return self._links
+
+    def patch_ids(self, faces):
+        return set(self.labels[f] for f in faces)
+
+    def faces(self, patch_ids):
+        """Return sorted faces of the given patches."""
+        return sorted(self.patches.gather(patch_ids))
+
+    def members(self, faces):
+        """Return faces of every patch touched by faces."""
+        return self.faces(self.patch_ids(faces))
+
+
+class UnionFind(object):
+    """Disjoint sets over a range of integers."""
+
+    __slots__ = ('parent',)
+
+    def __init__(self, size):
+        self.parent = int_array(xrange(size))
+
+    def find(self, item):
+        parent = self.parent
+        while not parent[item] == item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if not first == second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+class DihedralIndex(object):
+    """
+    Face regions bounded by edges above a dihedral angle.
+
+    Manifold edges are sorted by angle and merged into a :class:`UnionFind` in
+    that order, so raising the angle only merges the edges in between. Asking
+    for a lower angle than the last one starts the merge over.
+    """
+
+    def __init__(self, edge_faces, angles, num_faces, blocked=()):
+        blocked = set(blocked)
+        edges = [
+            e for e in xrange(len(angles))
+            if len(edge_faces[e]) == 2 and e not in blocked
+        ]
+        edges.sort(key=angles.__getitem__)
+        self.edges = int_array(edges)
+        self.angles = array.array('d', (angles[e] for e in edges))
+        self.edge_faces = edge_faces
+        self.num_faces = num_faces
+        self._reset()
+
+    def _reset(self):
+        self.sets = UnionFind(self.num_faces)
+        self.merged = 0
+
+    def merge(self, angle):
+        """Merge faces across every edge at or below angle, in radians."""
+        count = bisect.bisect_right(self.angles, angle)
+        if count < self.merged:
+            self._reset()
+        union = self.sets.union
+        for edge in self.edges[self.merged:count]:
+            union(*self.edge_faces[edge])
+        self.merged = count
+
+    def iter_members(self, faces, angle):
+        """Yield faces in the regions of faces bounded at angle."""
+        self.merge(angle)
+        find = self.sets.find
+        roots = set(find(f) for f in faces)
+        return (f for f in xrange(self.num_faces) if find(f) in roots)
+
+    def members(self, faces, angle):
+        """Return faces in the regions of faces bounded at angle."""
+        return Bitset.from_indices(self.iter_members(faces, angle), self.num_faces)
+
+
+def element_loops(links, element_faces, face_elements):
+    """Return :class:`LoopIndex` of every loop through linked elements."""
+    loops, closed, covered = [], [], set()
+    for element in xrange(len(links)):
+        for other in links[element]:
+            if (element, other) in covered:
+                continue
+            loop, is_closed = trace_loop(
+                links, element_faces, face_elements, element, other)
+            pairs = zip(loop, loop[1:] + loop[:1] if is_closed else loop[1:])
+            for first, second in pairs:
+                covered.add((first, second))
+                covered.add((second, first))
+            loops.append(loop)
+            closed.append(is_closed)
+    return LoopIndex(loops, closed, len(links))
+
+
+class UVTopology(object):
+    """
+    UV connectivity of a mesh for a single uv set.
+
+    Everything is read from the face-vertex uv assignment in one pass. Two uvs
+    are linked when they follow each other around a face, so links and shells
+    respect uv seams.
+    """
+
+    def __init__(self, topology, uvset=None):
+        mesh = topology.mesh
+        self.topology = topology
+        self.uvset = uvset or mesh.currentUVSetName()
+        self.num_uvs = mesh.numUVs(self.uvset)
+        self.generation = topology.uv_generation
+
+        counts, uvs = mesh.getAssignedUVs(self.uvset)
+        self.face_uvs = CSR.from_counts(counts, uvs)
+
+        vert_uvs = [set() for _ in xrange(topology.num_verts)]
+        edge_uvs = [set() for _ in xrange(topology.num_edges)]
+        links = [set() for _ in xrange(self.num_uvs)]
+        for face in xrange(topology.num_faces):
+            uvs = self.face_uvs[face]
+            verts, edges = topology.face_verts[face], topology.face_edges[face]
+            if not len(uvs) == len(verts):
+                continue
+            count = len(uvs)
+            for i in xrange(count):
+                uv1, uv2 = uvs[i], uvs[(i + 1) % count]
+                vert_uvs[verts[i]].add(uv1)
+                edge_uvs[edges[i]].update((uv1, uv2))
+                links[uv1].add(uv2)
+                links[uv2].add(uv1)
+
+        self.vert_uvs = CSR.from_rows(sorted(row) for row in vert_uvs)
+        self.edge_uvs = CSR.from_rows(sorted(row) for row in edge_uvs)
+        self.uv_links = CSR.from_rows(sorted(row) for row in links)
+        self.uv_verts = self.vert_uvs.transpose(self.num_uvs)
+        self.uv_edges = self.edge_uvs.transpose(self.num_uvs)
+        self.uv_faces = self.face_uvs.transpose(self.num_uvs)
+        self._shells = None
+        self._loops = None
+
+    def is_valid(self):
+        mesh = self.topology.mesh
+        return (self.generation == self.topology.uv_generation and
+                self.uvset == mesh.currentUVSetName() and
+                self.num_uvs == mesh.numUVs(self.uvset))
+
+    @property
+    def shells(self):
+        """Return uv shell label for each uv."""
+        if self._shells is None:
+            self._shells = label_components(self.uv_links)
+        return self._shells
+
+    @property
+    def loops(self):
+        """Return :class:`LoopIndex` of uv loops."""
+        if self._loops is None:
+            self._loops = element_loops(self.uv_links, self.uv_faces, self.face_uvs)
+        return self._loops
+
+    def seams(self):
+        """Return mesh edges split in uv space."""
+        return [
+            edge for edge in xrange(len(self.edge_uvs))
+            if len(self.edge_uvs[edge]) > 2
+        ]
+
+    def grow(self, uvs):
+        result = self.uv_links.gather_bits(uvs, self.num_uvs)
+        result.update(uvs)
+        return result
+
+    def iter_shell_members(self, uvs):
+        labels = self.shells
+        shells = set(labels[uv] for uv in uvs)
+        return (uv for uv in xrange(self.num_uvs) if labels[uv] in shells)
+
+    def shell_members(self, uvs):
+        return Bitset.from_indices(self.iter_shell_members(uvs), self.num_uvs)
+
+    def path(self, start, end):
+        return shortest_path(self.uv_links, start, end)
+
+    def loop(self, first, second):
+        return walk_loop(self.uv_links, self.uv_faces, self.face_uvs, first, second)
+
+
+class MeshTopology(object):
+    """
+    Connectivity of a single mesh.
+
+    ``face_verts``, ``face_edges``, ``edge_verts`` and ``vert_edges`` are always
+    kept, ``vert_faces`` and ``edge_faces`` are created on first access. Tables
+    of large meshes are persisted in the :mod:`diskcache` and mapped back in
+    when the same topology is seen again.
+    """
+
+    def __init__(self, dagpath):
+        self.dagpath = None if dagpath is None else get_dagpath(dagpath)
+        self.dirty = False
+        # Bumped whenever the mesh node is dirtied, e.g. by edge softening.
+        self.generation = 0
+        # Bumped whenever a plug holding uvs or their assignment is dirtied.
+        self.uv_generation = 0
+        # Bumped whenever a plug holding vertex positions is dirtied.
+        self.points_generation = 0
+
+        self.face_verts = None
+        self.face_edges = None
+        self.edge_verts = None
+        self.vert_edges = None
+        self.num_verts = 0
+
+        self._entry = None
+        self._vert_faces = None
+        self._edge_faces = None
+        self._uv = None
+        self._border_loops = None
+        self._vert_shells = None
+        self._vert_links = None
+        self._links = {}
+        self._loops = {}
+        self._patches = {}
+        self._key = None
+        self._dihedral = {}
+        self._points = None
+
+        if self.dagpath is not None:
+            self.build()
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.name)
+
+    @classmethod
+    def from_arrays(cls, counts, vertices, points=None):
+        """
+        Create topology from face vertex counts and ids, without a mesh.
+
+        Edges are numbered in order of first appearance around the faces, which
+        won't match Maya's numbering for the same mesh.
+        """
+        topology = cls(None)
+        topology.face_verts = CSR.from_counts(counts, vertices)
+        topology.num_verts = max(topology.face_verts.values or [-1]) + 1
+        if points is not None:
+            topology._points = array.array('d', points)
+            topology.num_verts = max(topology.num_verts, len(points) // 3)
+
+        edges, rows = {}, []
+        for verts in topology.face_verts:
+            count = len(verts)
+            for i in xrange(count):
+                v1, v2 = verts[i], verts[(i + 1) % count]
+                key = (v1, v2) if v1 < v2 else (v2, v1)
+                if key not in edges:
+                    edges[key] = len(rows)
+                    rows.append(key)
+
+        topology.edge_verts = CSR.from_rows(rows)
+        topology.vert_edges = topology.edge_verts.transpose(topology.num_verts)
+        topology.face_edges = CSR.from_rows(
+            topology._get_face_edges(row) for row in topology.face_verts
+        )
+        return topology
+
+    @property
+    def name(self):
+        if self.dagpath is None:
+            return '<arrays>'
+        return self.dagpath.fullPathName()
+
+    @property
+    def mesh(self):
+        if self.dagpath is None:
+            raise TypeError('{} is not backed by a mesh.'.format(self))
+        return api.MFnMesh(self.dagpath)
+
+    @property
+    def key(self):
+        """Return hash identifying the connectivity of the mesh."""
+        if self._key is None:
+            self._key = diskcache.topology_hash(
+                self.face_verts.offsets, self.face_verts.values,
+                int_array([self.num_verts, self.num_edges]),
+            )
+        return self._key
+
+    @property
+    def num_edges(self):
+        return len(self.edge_verts)
+
+    @property
+    def num_faces(self):
+        return len(self.face_verts)
+
+    @property
+    def vert_faces(self):
+        if self._vert_faces is None:
+            self._vert_faces = self._cached(
+                'vert_faces', lambda: self.face_verts.transpose(self.num_verts)
+            )
+        return self._vert_faces
+
+    @property
+    def edge_faces(self):
+        if self._edge_faces is None:
+            self._edge_faces = self._cached(
+                'edge_faces', lambda: self.face_edges.transpose(self.num_edges)
+            )
+        return self._edge_faces
+
+    @property
+    def uv(self):
+        """
+        Return :class:`UVTopology` for current uv set.
+
+        UV edits don't change topology so it is rebuilt whenever a uv plug of
+        the mesh was dirtied, or the uv set or uv count differs from what was
+        last read.
+        """
+        if self._uv is None or not self._uv.is_valid():
+            self._uv = UVTopology(self)
+        return self._uv
+
+    @property
+    def num_uvs(self):
+        return self.uv.num_uvs
+
+    @property
+    def face_uvs(self):
+        return self.uv.face_uvs
+
+    @property
+    def vert_uvs(self):
+        return self.uv.vert_uvs
+
+    @property
+    def edge_uvs(self):
+        return self.uv.edge_uvs
+
+    @property
+    def uv_verts(self):
+        return self.uv.uv_verts
+
+    @property
+    def uv_edges(self):
+        return self.uv.uv_edges
+
+    @property
+    def uv_faces(self):
+        return self.uv.uv_faces
+
+    @property
+    def border_loops(self):
+        """
+        Return ordered border edge chains and a lookup of edge to position.
+
+        The lookup maps each border edge to ``(loop index, position)``.
+        """
+        if self._border_loops is None:
+            offsets = self.edge_faces.offsets
+            border = set(
+                e for e in xrange(self.num_edges) if offsets[e + 1] - offsets[e] == 1
+            )
+            loops, lookup = [], {}
+            for start in sorted(border):
+                if start in lookup:
+                    continue
+                loop = int_array([start])
+                lookup[start] = (len(loops), 0)
+
+                edge, vert = start, self.edge_verts[start][1]
+                while True:
+                    for edge in self.vert_edges[vert]:
+                        if edge in border and edge not in lookup:
+                            break
+                    else:
+                        break
+                    lookup[edge] = (len(loops), len(loop))
+                    loop.append(edge)
+                    v1, v2 = self.edge_verts[edge]
+                    vert = v2 if v1 == vert else v1
+                loops.append(loop)
+            self._border_loops = (loops, lookup)
+        return self._border_loops
+
+    def border_loop(self, edge):
+        """Return ordered border chain containing edge and edge position in it."""
+        loops, lookup = self.border_loops
+        try:
+            loop, position = lookup[edge]
+        except KeyError:
+            raise ValueError('Edge {} is not a border edge.'.format(edge))
+        return loops[loop], position
+
+    @property
+    def vert_shells(self):
+        """Return shell label for each vertex."""
+        if self._vert_shells is None:
+            self._vert_shells = self._cached('vert_shells', self._get_vert_shells)
+        return self._vert_shells
+
+    def _get_vert_shells(self):
+        labels = int_array([-1]) * self.num_verts
+        label = 0
+        for start in xrange(self.num_verts):
+            if not labels[start] == -1:
+                continue
+            labels[start] = label
+            stack = [start]
+            while stack:
+                vert = stack.pop()
+                for edge in self.vert_edges[vert]:
+                    for other in self.edge_verts[edge]:
+                        if labels[other] == -1:
+                            labels[other] = label
+                            stack.append(other)
+            label += 1
+        return labels
+
+    @property
+    def vert_links(self):
+        """Return table of vertices connected to each vertex by an edge."""
+        if self._vert_links is None:
+            self._vert_links = CSR.from_rows(
+                sorted(self.edge_verts.gather(edges) - set([vert]))
+                for vert, edges in enumerate(self.vert_edges)
+            )
+        return self._vert_links
+
+    def links(self, comptype):
+        """
+        Return neighbour table for component type, built on first use.
+
+        Verts are linked by edges, edges by verts and faces by edges.
+        """
+        if comptype == MFn.kMeshMapComponent:
+            return self.uv.uv_links
+        if comptype == MFn.kMeshVertComponent:
+            return self.vert_links
+        if comptype not in self._links:
+            try:
+                down, up = {
+                    MFn.kMeshEdgeComponent: (self.edge_verts, self.vert_edges),
+                    MFn.kMeshPolygonComponent: (self.face_edges, self.edge_faces),
+                }[comptype]
+            except KeyError:
+                raise TypeError('Topology links only exist for mesh verts, '
+                                'edges, faces and uvs.')
+            self._links[comptype] = CSR.from_rows(
+                sorted(up.gather(row) - set([i])) for i, row in enumerate(down)
+            )
+        return self._links[comptype]
+
+    def loops(self, comptype):
+        """Return :class:`LoopIndex` for component type, built on first use."""
+        if comptype == MFn.kMeshMapComponent:
+            return self.uv.loops
+        if comptype not in self._loops:
+            self._loops[comptype] = {
+                MFn.kMeshVertComponent: self._get_vert_loops,
+                MFn.kMeshEdgeComponent: self._get_edge_loops,
+                MFn.kMeshPolygonComponent: self._get_face_loops,
+            }[comptype]()
+        return self._loops[comptype]
+
+    def _get_vert_loops(self):
+        return element_loops(self.vert_links, self.vert_faces, self.face_verts)
+
+    def _get_edge_loops(self):
+        verts = self.loops(MFn.kMeshVertComponent)
+        loops, closed = [], []
+        for loop, row in enumerate(verts.loops):
+            is_closed = verts.closed[loop]
+            pairs = zip(row, row[1:] + row[:1] if is_closed else row[1:])
+            loops.append([self.find_edge(v1, v2) for v1, v2 in pairs])
+            closed.append(is_closed)
+        return LoopIndex(loops, closed, self.num_edges)
+
+    def _get_face_loops(self):
+        """Return quad strips, each quad takes part in one strip per edge pair."""
+        edge_faces, face_edges = self.edge_faces, self.face_edges
+
+        def walk(face, exit, covered):
+            walked = []
+            while True:
+                edge = face_edges[face][exit]
+                following = [f for f in edge_faces[edge] if not f == face]
+                if not len(following) == 1:
+                    return walked, None
+                face = following[0]
+                edges = face_edges[face]
+                if not len(edges) == 4:
+                    return walked, None
+                entry = edges.index(edge)
+                if (face, entry % 2) in covered:
+                    return walked, face
+                covered.add((face, entry % 2))
+                walked.append(face)
+                exit = (entry + 2) % 4
+
+        loops, closed, covered = [], [], set()
+        for face in xrange(self.num_faces):
+            if not len(face_edges[face]) == 4:
+                continue
+            for parity in (0, 1):
+                if (face, parity) in covered:
+                    continue
+                covered.add((face, parity))
+                forward, stop = walk(face, parity + 2, covered)
+                if stop == face:
+                    loops.append([face] + forward)
+                    closed.append(True)
+                    continue
+                backward, _ = walk(face, parity, covered)
+                backward.reverse()
+                loops.append(backward + [face] + forward)
+                closed.append(False)
+        return LoopIndex(loops, closed, self.num_faces)
+
+    def count(self, comptype):
+        """Return number of components of given type."""
+        return {
+            MFn.kMeshVertComponent: lambda: self.num_verts,
+            MFn.kMeshEdgeComponent: lambda: self.num_edges,
+            MFn.kMeshPolygonComponent: lambda: self.num_faces,
+            MFn.kMeshMapComponent: lambda: self.num_uvs,
+        }[comptype]()
+
+    def iter_shell_members(self, comptype, indices):
+        """Yield components in the shells touched by indices, in index order."""
+        if comptype == MFn.kMeshMapComponent:
+            return self.uv.iter_shell_members(indices)
+
+        labels = self.vert_shells
+        if comptype == MFn.kMeshVertComponent:
+            shells = set(labels[i] for i in indices)
+            return (i for i in xrange(self.num_verts) if labels[i] in shells)
+
+        to_vert = self.table(comptype, MFn.kMeshVertComponent)
+        shells = set(labels[v] for v in to_vert.gather_bits(indices, self.num_verts))
+        offsets, values = to_vert.offsets, to_vert.values
+        return (
+            i for i in xrange(len(to_vert))
+            if offsets[i] < offsets[i + 1] and labels[values[offsets[i]]] in shells
+        )
+
+    def shell_members(self, comptype, indices):
+        """Return :class:`Bitset` of components in the shells touched by indices."""
+        return Bitset.from_indices(
+            self.iter_shell_members(comptype, indices), self.count(comptype)
+        )
+
+    def is_closed(self, edges):
+        """Return True if ordered edge chain ends where it starts."""
+        if len(edges) < 3:
+            return False
+        return bool(set(self.edge_verts[edges[0]]) & set(self.edge_verts[edges[-1]]))
+
+    def is_valid(self):
+        if self.dagpath is None:
+            return True
+        mesh = self.mesh
+        return (not self.dirty and
+                mesh.numVertices == self.num_verts and
+                mesh.numEdges == self.num_edges and
+                mesh.numPolygons == self.num_faces)
+
+    def build(self):
+        """Read full topology from mesh, or map it in from the disk cache."""
+        mesh = self.mesh
+        counts, vertices = mesh.getVertices()
+
+        self.num_verts = mesh.numVertices
+        self.face_verts = CSR.from_counts(counts, vertices)
+        self._vert_faces = self._edge_faces = self._uv = None
+        self._border_loops = self._vert_shells = self._vert_links = None
+        self._links = {}
+        self._loops = {}
+        self._patches = {}
+        self._key = None
+        self._dihedral = {}
+        self._entry = self._get_entry(mesh.numEdges)
+
+        def read_edges():
+            return CSR.from_rows(
+                mesh.getEdgeVertices(e) for e in xrange(mesh.numEdges)
+            )
+
+        self.edge_verts = self._cached('edge_verts', read_edges)
+        if not self._verify_edges(mesh):
+            logger.warn('Disk cache for {} is stale, rebuilding.'.format(self))
+            self._entry = None
+            self.edge_verts = read_edges()
+
+        self.vert_edges = self._cached(
+            'vert_edges', lambda: self.edge_verts.transpose(self.num_verts)
+        )
+        self.face_edges = self._cached('face_edges', lambda: CSR.from_rows(
+            self._get_face_edges(row) for row in self.face_verts
+        ))
+        self.dirty = False
+        logger.debug('Built topology for {}'.format(self))
+
+    def _get_entry(self, num_edges):
+        if self.num_faces < diskcache.MIN_FACES:
+            return None
+        key = diskcache.topology_hash(
+            self.face_verts.offsets, self.face_verts.values,
+            int_array([self.num_verts, num_edges]),
+        )
+        return diskcache.get_entry(key, create=True)
+
+    def _verify_edges(self, mesh):
+        """Spot check edges mapped in from disk against the mesh."""
+        if self._entry is None:
+            return True
+        step = max(1, self.num_edges // 16)
+        for edge in xrange(0, self.num_edges, step):
+            if not list(self.edge_verts[edge]) == list(mesh.getEdgeVertices(edge)):
+                return False
+        return True
+
+    def _cached(self, name, create):
+        """Return table from disk cache, creating and persisting it if missing."""
+        entry = self._entry
+        if entry is not None:
+            if name + '.offsets' in entry:
+                return CSR(entry[name + '.offsets'], entry[name + '.values'])
+            elif name in entry:
+                return entry[name]
+
+        table = create()
+        if entry is not None:
+            try:
+                if isinstance(table, CSR):
+                    # Offsets go last, their presence marks a complete table.
+                    entry.store(name + '.values', table.values)
+                    entry.store(name + '.offsets', table.offsets)
+                else:
+                    entry.store(name, table)
+            except (IOError, OSError):
+                logger.warn('Unable to write {} to disk cache.'.format(name))
+                self._entry = None
+        return table
+
+    def update(self):
+        """
+        Bring topology up to date with mesh, patching only changed faces.
+
+        Edits that remove components renumber the mesh and are rebuilt.
+        """
+        mesh = self.mesh
+        num_verts, num_edges = mesh.numVertices, mesh.numEdges
+        if (num_verts < self.num_verts or num_edges < self.num_edges or
+                mesh.numPolygons < self.num_faces):
+            return self.build()
+
+        counts, vertices = mesh.getVertices()
+        face_verts = CSR.from_counts(counts, vertices)
+        changed = changed_rows(self.face_verts, face_verts)
+        if len(changed) > REBUILD_FRACTION * len(face_verts):
+            return self.build()
+        self.patch(face_verts, changed, num_verts, num_edges)
+
+    def patch(self, face_verts, changed, num_verts, num_edges):
+        """Splice neighborhood of changed faces into the cached arrays."""
+        mesh = self.mesh
+        old_face_verts, self.face_verts = self.face_verts, face_verts
+
+        verts = set(xrange(self.num_verts, num_verts))
+        for face in changed:
+            if face < len(old_face_verts):
+                verts.update(old_face_verts[face])
+            verts.update(face_verts[face])
+
+        edges = set(xrange(self.num_edges, num_edges))
+        edges.update(self.vert_edges.gather(
+            v for v in verts if v < self.num_verts
+        ))
+        edges = sorted(edges)
+
+        old_edge_verts = self.edge_verts
+        self.edge_verts = old_edge_verts.splice(
+            dict((e, mesh.getEdgeVertices(e)) for e in edges)
+        )
+        self.vert_edges = patch_inverse(
+            self.vert_edges, edges, old_edge_verts, self.edge_verts, num_verts
+        )
+
+        old_face_edges = self.face_edges
+        self.face_edges = old_face_edges.splice(
+            dict((f, self._get_face_edges(face_verts[f])) for f in changed)
+        )
+        if self._vert_faces is not None:
+            self._vert_faces = patch_inverse(
+                self._vert_faces, changed, old_face_verts, face_verts, num_verts
+            )
+        if self._edge_faces is not None:
+            self._edge_faces = patch_inverse(
+                self._edge_faces, changed, old_face_edges, self.face_edges,
+                num_edges
+            )
+
+        self.num_verts = num_verts
+        self._uv = self._border_loops = self._vert_shells = None
+        self._vert_links = None
+        self._links = {}
+        self._loops = {}
+        self._patches = {}
+        self._key = None
+        self._dihedral = {}
+        # Patched tables no longer match the hash they were cached under.
+        self._entry = None
+        self.dirty = False
+        logger.debug('Patched {} faces on {}'.format(len(changed), self))
+
+    def has_points(self):
+        return self.dagpath is not None or self._points is not None
+
+    def points(self, space=api.MSpace.kObject):
+        """Return flat array of vertex positions, three floats per vertex."""
+        if self.dagpath is None:
+            if self._points is None:
+                raise TypeError('{} has no points.'.format(self))
+            return self._points
+        result = array.array('d')
+        for point in self.mesh.getPoints(space):
+            result.extend((point.x, point.y, point.z))
+        return result
+
+    def face_vectors(self, points):
+        """
+        Return flat array of unnormalized face normals (Newell's method).
+
+        The length of each vector is twice the area of the face.
+        """
+        result = array.array('d')
+        for verts in self.face_verts:
+            x = y = z = 0.0
+            count = len(verts)
+            for i in xrange(count):
+                a, b = verts[i] * 3, verts[(i + 1) % count] * 3
+                ax, ay, az = points[a], points[a + 1], points[a + 2]
+                bx, by, bz = points[b], points[b + 1], points[b + 2]
+                x += (ay - by) * (az + bz)
+                y += (az - bz) * (ax + bx)
+                z += (ax - bx) * (ay + by)
+            result.extend((x, y, z))
+        return result
+
+    def face_normals(self, points):
+        """Return flat array of normalized face normals."""
+        result = self.face_vectors(points)
+        for i in xrange(0, len(result), 3):
+            x, y, z = result[i:i + 3]
+            length = math.sqrt(x * x + y * y + z * z) or 1.0
+            result[i:i + 3] = array.array('d', (x / length, y / length, z / length))
+        return result
+
+    def face_centers(self, points):
+        """Return flat array of face centers."""
+        result = array.array('d')
+        for verts in self.face_verts:
+            x = y = z = 0.0
+            for vert in verts:
+                x += points[vert * 3]
+                y += points[vert * 3 + 1]
+                z += points[vert * 3 + 2]
+            count = float(len(verts) or 1)
+            result.extend((x / count, y / count, z / count))
+        return result
+
+    def planar_patches(self, tolerance=0.1, offset=PLANE_TOLERANCE):
+        """
+        Return :class:`PatchIndex` of edge connected planar patches.
+
+        Patches grow from a seed face over faces whose normal lies within
+        tolerance of the seed normal and whose center lies within offset of
+        the seed plane. Patches are cached per tolerance until the topology
+        changes or a point plug of the mesh is dirtied.
+        """
+        cached = self._patches.get((tolerance, offset))
+        if cached is not None and cached[0] == self.points_generation:
+            return cached[1]
+
+        points = self.points()
+        normals, centers = self.face_normals(points), self.face_centers(points)
+        links = self.links(MFn.kMeshPolygonComponent)
+        labels = int_array([-1]) * self.num_faces
+        patch_normals = array.array('d')
+        for seed in xrange(self.num_faces):
+            if not labels[seed] == -1:
+                continue
+            label = len(patch_normals) // 3
+            sx, sy, sz = normals[seed * 3:seed * 3 + 3]
+            cx, cy, cz = centers[seed * 3:seed * 3 + 3]
+            plane = sx * cx + sy * cy + sz * cz
+
+            labels[seed] = label
+            stack = [seed]
+            while stack:
+                for other in links[stack.pop()]:
+                    if not labels[other] == -1:
+                        continue
+                    i = other * 3
+                    x, y, z = normals[i:i + 3]
+                    if math.sqrt((x - sx) ** 2 + (y - sy) ** 2 + (z - sz) ** 2) > tolerance:
+                        continue
+                    cx, cy, cz = centers[i:i + 3]
+                    if abs(sx * cx + sy * cy + sz * cz - plane) > offset:
+                        continue
+                    labels[other] = label
+                    stack.append(other)
+            patch_normals.extend((sx, sy, sz))
+
+        patches = PatchIndex(labels, patch_normals, self.vert_faces)
+        self._patches[tolerance, offset] = (self.points_generation, patches)
+        logger.debug('Found {} planar patches on {}'.format(len(patches), self))
+        return patches
+
+    def dihedral_angles(self, points):
+        """
+        Return angle in radians between face normals across each edge.
+
+        Border and non-manifold edges get an angle of pi.
+        """
+        normals = self.face_normals(points)
+        result = array.array('d', [math.pi]) * self.num_edges
+        for edge, faces in enumerate(self.edge_faces):
+            if not len(faces) == 2:
+                continue
+            a, b = faces[0] * 3, faces[1] * 3
+            dot = (normals[a] * normals[b] + normals[a + 1] * normals[b + 1] +
+                   normals[a + 2] * normals[b + 2])
+            result[edge] = math.acos(max(-1.0, min(1.0, dot)))
+        return result
+
+    def hard_edges(self):
+        """Return set of edges that are hard or creased."""
+        if self.dagpath is None:
+            return set()
+        mesh = self.mesh
+        hard = set(e for e in xrange(self.num_edges) if not mesh.isEdgeSmooth(e))
+        try:
+            edges, values = mesh.getCreaseEdges()
+        except RuntimeError:
+            # Raised when the mesh has no creases.
+            return hard
+        hard.update(e for e, value in zip(edges, values) if value > 0)
+        return hard
+
+    def dihedral_index(self, hard=False):
+        """
+        Return :class:`DihedralIndex` of mesh, blocking hard edges if hard.
+
+        Angles are cached until topology or points change. Hard edges are only
+        read again when the mesh node was dirtied since they were last read.
+        """
+        points = self.points()
+        generation = self.generation if hard else None
+        cached = self._dihedral.get(hard)
+        if cached is not None and cached[0] == points and cached[1] == generation:
+            return cached[2]
+
+        blocked = self.hard_edges() if hard else ()
+        index = DihedralIndex(
+            self.edge_faces, self.dihedral_angles(points), self.num_faces, blocked)
+        self._dihedral[hard] = (points, generation, index)
+        return index
+
+    def edge_vectors(self, edges, points):
+        """Return flat array of normalized edge directions."""
+        result = array.array('d')
+        for edge in edges:
+            v1, v2 = self.edge_verts[edge]
+            v1, v2 = v1 * 3, v2 * 3
+            x = points[v2] - points[v1]
+            y = points[v2 + 1] - points[v1 + 1]
+            z = points[v2 + 2] - points[v1 + 2]
+            length = math.sqrt(x * x + y * y + z * z) or 1.0
+            result.extend((x / length, y / length, z / length))
+        return result
+
+    def edge_lengths(self, points):
+        """Return array of edge lengths."""
+        result = array.array('d')
+        for v1, v2 in self.edge_verts:
+            v1, v2 = v1 * 3, v2 * 3
+            x = points[v2] - points[v1]
+            y = points[v2 + 1] - points[v1 + 1]
+            z = points[v2 + 2] - points[v1 + 2]
+            result.append(math.sqrt(x * x + y * y + z * z))
+        return result
+
+    def _get_face_edges(self, verts):
+        count = len(verts)
+        return int_array(
+            self.find_edge(verts[i], verts[(i + 1) % count])
+            for i in xrange(count)
+        )
+
+    def find_edge(self, v1, v2):
+        """Return edge connecting two vertices or -1."""
+        for edge in self.vert_edges[v1]:
+            if v2 in self.edge_verts[edge]:
+                return edge
+        return -1
+
+    def adjacent(self, comptype, indices):
+        """Return :class:`Bitset` of components sharing a lower order component."""
+        if comptype == MFn.kMeshMapComponent:
+            return self.uv.grow(indices)
+        try:
+            down, up = {
+                MFn.kMeshPolygonComponent: (self.face_edges, self.edge_faces),
+                MFn.kMeshEdgeComponent: (self.edge_verts, self.vert_edges),
+                MFn.kMeshVertComponent: (self.vert_edges, self.edge_verts),
+            }[comptype]
+        except KeyError:
+            raise TypeError('Topology adjacency only exists for mesh verts, '
+                            'edges and faces.')
+        return up.gather_bits(down.gather_bits(indices, len(up)), len(down))
+
+    def table(self, source, target):
+        """Return incidence table mapping source to target component type."""
+        try:
+            return getattr(self, CONVERSION_TABLES[source, target])
+        except KeyError:
+            raise TypeError('No conversion table from {} to {}.'.format(
+                source, target))
+
+    def convert(self, indices, source, target, border=False, internal=False):
+        """
+        Return :class:`Bitset` of indices converted from source to target type.
+
+        ``internal`` keeps only components fully contained in the given ones,
+        ``border`` keeps only components on the border of the given ones.
+        Conversions without a direct table go through vertices.
+        """
+        if source == target:
+            return Bitset.from_indices(indices, self.count(source))
+        if (source, target) not in CONVERSION_TABLES:
+            verts = self.convert(indices, source, MFn.kMeshVertComponent,
+                                 border, internal)
+            return self.convert(verts, MFn.kMeshVertComponent, target,
+                                internal=internal)
+
+        converted = self.table(source, target).gather_bits(indices, self.count(target))
+        if not (border or internal):
+            return converted
+
+        if border and source == MFn.kMeshPolygonComponent:
+            return self._face_border(indices, target)
+
+        if not isinstance(indices, Bitset):
+            indices = Bitset.from_indices(indices, self.count(source))
+        reverse = self.table(target, source)
+        contained = Bitset.from_indices((
+            c for c in converted if all(i in indices for i in reverse[c])
+        ), converted.size)
+        return converted - contained if border else contained
+
+    def _face_border(self, faces, target):
+        """Return edges or vertices on the perimeter of given faces."""
+        once, twice = Bitset(self.num_edges), Bitset(self.num_edges)
+        face_edges = self.face_edges
+        for face in faces:
+            for edge in face_edges[face]:
+                if edge in once:
+                    twice.add(edge)
+                else:
+                    once.add(edge)
+        edges = once - twice
+        if target == MFn.kMeshEdgeComponent:
+            return edges
+        return self.convert(edges, MFn.kMeshEdgeComponent, target)
+
+    def face_neighbours(self, faces):
+        """Return faces sharing a vertex with given faces, themselves included."""
+        return self.vert_faces.gather_bits(
+            self.face_verts.gather_bits(faces, self.num_verts), self.num_faces
+        )
+
+
+_cache = {}
+_callbacks = {}
+
+
+def _on_topology_changed(node, key):
+    try:
+        _cache[key].dirty = True
+    except KeyError:
+        pass
+
+
+def _on_plug_dirty(node, plug, key):
+    try:
+        topology = _cache[key]
+    except KeyError:
+        return
+    topology.generation += 1
+    name = api.MFnAttribute(plug.attribute()).name
+    if name.startswith(UV_ATTRIBUTES):
+        topology.uv_generation += 1
+    if name.startswith(POINT_ATTRIBUTES):
+        topology.points_generation += 1
+
+
+def _watch(topology):
+    key = topology.name
+    node = topology.dagpath.node()
+    callbacks = _callbacks[key] = []
+    try:
+        callbacks.append(api.MPolyMessage.addPolyTopologyChangedCallback(
+            node, _on_topology_changed, key
+        ))
+        callbacks.append(api.MNodeMessage.addNodeDirtyPlugCallback(
+            node, _on_plug_dirty, key
+        ))
+    except RuntimeError:
+        logger.debug('Unable to watch {} for topology changes.'.format(key))
+
+
+def get_topology(dagpath):
+    """Return cached :class:`MeshTopology` for mesh, updating it if stale."""
+    dagpath = get_dagpath(dagpath)
+    key = dagpath.fullPathName()
+
+    topology = _cache.get(key)
+    if topology is None:
+        topology = _cache[key] = MeshTopology(dagpath)
+        _watch(topology)
+    elif not topology.is_valid():
+        topology.update()
+    return topology
+
+
+def invalidate(dagpath=None):
+    """Drop cached topology for given mesh, or all meshes."""
+    keys = list(_cache) if dagpath is None else [get_dagpath(dagpath).fullPathName()]
+    for key in keys:
+        _cache.pop(key, None)
+        for callback in _callbacks.pop(key, ()):
+            try:
+                api.MMessage.removeCallback(callback)
+            except RuntimeError:
+                pass